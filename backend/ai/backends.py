@@ -0,0 +1,200 @@
+import asyncio
+import json
+import os
+import time
+import zlib
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional
+
+from langchain.chat_models import init_chat_model
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk, BaseMessage
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from langchain_core.runnables import RunnableLambda
+from dotenv import load_dotenv
+
+from ai.llm import LLM_MAX_CONCURRENCY, json_schema_response_format
+load_dotenv()
+
+
+# Welches LLM-Backend verwendet wird: "openai" (Standard) oder "fake" für Lasttests ohne Netzwerk
+LLM_BACKEND = os.getenv("LLM_BACKEND", "openai")
+LLM_MODEL = os.getenv("LLM_MODEL", "gpt-4.1")
+
+# Fake backend: fixed latency before the first token plus simulated generation speed
+LLM_FAKE_LATENCY_SECONDS = float(os.getenv("LLM_FAKE_LATENCY_SECONDS", "0.3"))
+LLM_FAKE_TOKENS_PER_SECOND = float(os.getenv("LLM_FAKE_TOKENS_PER_SECOND", "80"))
+LLM_FAKE_RESPONSES_FILE = os.getenv(
+    "LLM_FAKE_RESPONSES_FILE", os.path.join(os.path.dirname(__file__), "fixtures", "fake_llm_responses.json")
+)
+
+# Rough size of a token, used for the simulated throughput and usage
+_CHARS_PER_TOKEN = 4
+
+
+class FakeChatModel(BaseChatModel):
+    """
+    Deterministic offline chat model for load tests and benchmarks.
+
+    Replays recorded responses keyed by the requested response schema
+    (CollectorResponse, SkillItem). The response is picked by a hash of the
+    prompt, so identical prompts get identical answers. Latency is
+    latency_seconds plus the completion tokens at tokens_per_second, and
+    usage_metadata is filled from the prompt and response lengths.
+    """
+
+    responses: Dict[str, List[Any]]
+    latency_seconds: float = 0.3
+    tokens_per_second: float = 80.0
+    model_name: str = "fake"
+
+    @property
+    def _llm_type(self) -> str:
+        return "fake"
+
+    def _pick_response(self, messages: List[BaseMessage], response_format: Optional[Dict]) -> str:
+        prompt = "".join(str(message.content) for message in messages)
+        schema_name = (response_format or {}).get("json_schema", {}).get("name", "text")
+        candidates = self.responses.get(schema_name)
+        if not candidates:
+            return f"Fake response ({len(prompt)} prompt characters)"
+        response = candidates[zlib.crc32(prompt.encode("utf-8")) % len(candidates)]
+        return response if isinstance(response, str) else json.dumps(response, ensure_ascii=False)
+
+    def _usage(self, messages: List[BaseMessage], content: str) -> Dict:
+        input_tokens = sum(len(str(message.content)) for message in messages) // _CHARS_PER_TOKEN + 1
+        output_tokens = len(content) // _CHARS_PER_TOKEN + 1
+        return {"input_tokens": input_tokens, "output_tokens": output_tokens, "total_tokens": input_tokens + output_tokens}
+
+    def _generation_seconds(self, content: str) -> float:
+        return self.latency_seconds + (len(content) / _CHARS_PER_TOKEN) / self.tokens_per_second
+
+    def _result(self, messages: List[BaseMessage], content: str) -> ChatResult:
+        message = AIMessage(
+            content=content,
+            response_metadata={"model_name": self.model_name},
+            usage_metadata=self._usage(messages, content),
+        )
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        content = self._pick_response(messages, kwargs.get("response_format"))
+        time.sleep(self._generation_seconds(content))
+        return self._result(messages, content)
+
+    async def _agenerate(self, messages, stop=None, run_manager=None, **kwargs) -> ChatResult:
+        content = self._pick_response(messages, kwargs.get("response_format"))
+        await asyncio.sleep(self._generation_seconds(content))
+        return self._result(messages, content)
+
+    def _pieces(self, content: str) -> List[str]:
+        return [content[index:index + _CHARS_PER_TOKEN] for index in range(0, len(content), _CHARS_PER_TOKEN)]
+
+    def _final_chunk(self, messages: List[BaseMessage], content: str) -> ChatGenerationChunk:
+        return ChatGenerationChunk(message=AIMessageChunk(
+            content="",
+            response_metadata={"model_name": self.model_name},
+            usage_metadata=self._usage(messages, content),
+        ))
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs) -> Iterator[ChatGenerationChunk]:
+        content = self._pick_response(messages, kwargs.get("response_format"))
+        started = time.monotonic() + self.latency_seconds
+        for index, piece in enumerate(self._pieces(content)):
+            # Pace against the overall schedule, so timer granularity does not add up per token
+            time.sleep(max(0.0, started + (index + 1) / self.tokens_per_second - time.monotonic()))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        yield self._final_chunk(messages, content)
+
+    async def _astream(self, messages, stop=None, run_manager=None, **kwargs) -> AsyncIterator[ChatGenerationChunk]:
+        content = self._pick_response(messages, kwargs.get("response_format"))
+        started = time.monotonic() + self.latency_seconds
+        for index, piece in enumerate(self._pieces(content)):
+            await asyncio.sleep(max(0.0, started + (index + 1) / self.tokens_per_second - time.monotonic()))
+            yield ChatGenerationChunk(message=AIMessageChunk(content=piece))
+        yield self._final_chunk(messages, content)
+
+    def with_structured_output(self, schema, *, include_raw: bool = False, **kwargs):
+        """
+        Same contract as ChatOpenAI's json_schema mode: the schema travels as
+        response_format and the JSON content is validated against it
+        """
+        bound = self.bind(response_format=json_schema_response_format(schema))
+
+        def parse(message: AIMessage):
+            try:
+                parsed, error = schema.model_validate_json(message.content), None
+            except Exception as e:
+                if not include_raw:
+                    raise
+                parsed, error = None, e
+            if include_raw:
+                return {"raw": message, "parsed": parsed, "parsing_error": error}
+            return parsed
+
+        return bound | RunnableLambda(parse)
+
+
+def _load_fake_responses() -> Dict[str, List[Any]]:
+    with open(LLM_FAKE_RESPONSES_FILE, encoding="utf-8") as file:
+        return json.load(file)
+
+
+def _create_openai(**kwargs) -> BaseChatModel:
+    import httpx
+
+    # One connection pool sized to the number of concurrent LLM calls
+    limits = httpx.Limits(max_connections=LLM_MAX_CONCURRENCY, max_keepalive_connections=LLM_MAX_CONCURRENCY)
+    return init_chat_model(
+        model=LLM_MODEL,
+        api_key=os.environ.get("OPENAI_API_KEY"),
+        http_async_client=httpx.AsyncClient(limits=limits),
+        http_client=httpx.Client(limits=limits),
+        **kwargs
+    )
+
+
+def _create_fake(**kwargs) -> BaseChatModel:
+    # Provider-specific options such as stream_usage do not apply to the fake model
+    return FakeChatModel(
+        responses=_load_fake_responses(),
+        latency_seconds=LLM_FAKE_LATENCY_SECONDS,
+        tokens_per_second=LLM_FAKE_TOKENS_PER_SECOND,
+    )
+
+
+_chat_model: Optional[BaseChatModel] = None
+
+BACKENDS: Dict[str, Callable[..., BaseChatModel]] = {
+    "openai": _create_openai,
+    "fake": _create_fake,
+}
+
+
+def register_backend(name: str, factory: Callable[..., BaseChatModel]):
+    """
+    Makes another chat model backend selectable through LLM_BACKEND
+    """
+    BACKENDS[name] = factory
+
+
+def create_chat_model(**kwargs) -> BaseChatModel:
+    """
+    Creates the chat model of the configured LLM_BACKEND
+    """
+    try:
+        factory = BACKENDS[LLM_BACKEND]
+    except KeyError:
+        raise ValueError(f"Unknown LLM_BACKEND '{LLM_BACKEND}', expected one of: {', '.join(BACKENDS)}")
+    return factory(**kwargs)
+
+
+def get_chat_model() -> BaseChatModel:
+    """
+    Returns the process-wide chat model, created on first use. All chains
+    share it and with it one client and connection pool.
+    """
+    global _chat_model
+    if _chat_model is None:
+        # stream_usage: token usage is also reported for streamed responses
+        _chat_model = create_chat_model(stream_usage=True)
+    return _chat_model
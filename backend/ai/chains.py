@@ -0,0 +1,34 @@
+from typing import Callable, Dict
+
+from langchain_core.runnables import Runnable
+
+
+# name -> factory building the chain (prompt, model binding and output parsing)
+_factories: Dict[str, Callable[[], Runnable]] = {}
+# name -> chain compiled by its factory, built on first use and then reused
+_chains: Dict[str, Runnable] = {}
+
+
+def register_chain(name: str, factory: Callable[[], Runnable]):
+    """
+    Registers how a chain is built - it is compiled once, on first use
+    """
+    _factories[name] = factory
+    _chains.pop(name, None)
+
+
+def get_chain(name: str) -> Runnable:
+    """
+    Returns the compiled chain, building it on first use
+    """
+    chain = _chains.get(name)
+    if chain is None:
+        chain = _chains[name] = _factories[name]()
+    return chain
+
+
+def reset_chains():
+    """
+    Drops all compiled chains, e.g. after the chat model was replaced
+    """
+    _chains.clear()
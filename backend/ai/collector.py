@@ -1,13 +1,22 @@
-from langchain.chat_models import init_chat_model
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field
-from typing import Optional, Dict, List, Literal
+from typing import Optional, Dict, List, Literal, Tuple
 from dotenv import load_dotenv
+from ai.backends import get_chat_model
+from ai.chains import get_chain, register_chain
 from ai.prompts import COLLECTOR_PROMPT
+from ai.llm import ainvoke_structured, invoke_structured, record_fallback
 import os
+import re
+import time
 load_dotenv()
 
+COLLECTOR_FIELDS = ("skill", "goal", "experience", "deadline")
+
+# Regelbasierte Vorextraktion: Felder ab dieser Konfidenz gelten als gesichert
+COLLECTOR_EXTRACTOR_ENABLED = os.getenv("COLLECTOR_EXTRACTOR_ENABLED", "1") not in ("0", "false", "False")
+COLLECTOR_EXTRACTOR_MIN_CONFIDENCE = float(os.getenv("COLLECTOR_EXTRACTOR_MIN_CONFIDENCE", "0.8"))
+
 
 class SkillData(BaseModel):
   skill: Optional[str] = Field(None, description="The skill to learn")
@@ -73,32 +82,33 @@ class CollectorRequest(BaseModel):
       }
     }
 
-collector_parser = PydanticOutputParser(pydantic_object=CollectorResponse)
-
-llm = init_chat_model(model="gpt-4.1", api_key=os.environ.get("OPENAI_API_KEY"))
-
-def collect_information(input) -> Dict:
+def _build_collector_chain():
   collector_prompt = PromptTemplate(
     template=COLLECTOR_PROMPT,
     input_variables=["skill", "goal", "experience", "deadline", "message"],
-    partial_variables={
-      "formation_template": collector_parser.get_format_instructions()
-    },
   )
 
-  chain = collector_prompt | llm 
+  # The response schema is enforced by the provider instead of format instructions in the prompt
+  return collector_prompt | get_chat_model().with_structured_output(
+    CollectorResponse, method="json_schema", include_raw=True
+  )
+
+
+register_chain("collector", _build_collector_chain)
 
-  llm_res = chain.invoke({
+
+def _collector_inputs(input) -> Dict:
+  return {
     "skill": input.get('skill', ''),
     "goal": input.get('goal', ''),
     "experience": input.get('experience', ''),
     "deadline": input.get('deadline', ''),
     "message": input.get('message', '')
-  })
+  }
+
 
-  try:
-    # Parse the response using the new structured format
-    response = collector_parser.parse(llm_res.content)
+def _parse_collector_response(input, response: Optional[CollectorResponse], raw, error: Optional[Exception]) -> Dict:
+  if response is not None:
     result = response.model_dump()
     
     # Override status based on missing_fields - if empty, status should be complete
@@ -106,71 +116,335 @@ def collect_information(input) -> Dict:
       result['status'] = 'complete'
     
     return result
-  except Exception as e:
-    print(f"Error parsing response: {e}")
-    print(f"LLM response: {llm_res.content}")
-    
-    # Check if all required fields are present in input for manual override
-    has_all_fields = all([
-      input.get('skill', '').strip(),
-      input.get('goal', '').strip(), 
-      input.get('experience', '').strip(),
-      input.get('deadline', '').strip()
-    ])
-    
-    if has_all_fields:
-      # If we have all fields but parsing failed, return complete status manually
-      return {
-        "status": "complete",
-        "current_data": {
-          "skill": input.get('skill'),
-          "goal": input.get('goal'),
-          "experience": input.get('experience'),
-          "deadline": input.get('deadline')
-        },
-        "missing_fields": [],
-        "next_question": None,
-        "error": str(e),
-        "raw_response": llm_res.content
-      }
-    
-    # Fallback: try to extract information manually
+  
+  # Structured output, local repair and the retry all failed
+  print(f"Error parsing response: {error}")
+  print(f"LLM response: {getattr(raw, 'content', raw)}")
+  record_fallback()
+  
+  # Check if all required fields are present in input for manual override
+  has_all_fields = all([
+    input.get('skill', '').strip(),
+    input.get('goal', '').strip(), 
+    input.get('experience', '').strip(),
+    input.get('deadline', '').strip()
+  ])
+  
+  if has_all_fields:
+    # If we have all fields but parsing failed, return complete status manually
     return {
-      "status": "collecting",
+      "status": "complete",
       "current_data": {
         "skill": input.get('skill'),
         "goal": input.get('goal'),
         "experience": input.get('experience'),
         "deadline": input.get('deadline')
       },
-      "missing_fields": ["skill", "goal", "experience", "deadline"],
-      "next_question": "Es gab einen Fehler beim Verarbeiten. Können Sie mir bitte nochmal Ihre Informationen geben?",
-      "error": str(e),
-      "raw_response": llm_res.content
+      "missing_fields": [],
+      "next_question": None,
+      "error": str(error)
     }
+  
+  # Fallback: try to extract information manually
+  return {
+    "status": "collecting",
+    "current_data": {
+      "skill": input.get('skill'),
+      "goal": input.get('goal'),
+      "experience": input.get('experience'),
+      "deadline": input.get('deadline')
+    },
+    "missing_fields": ["skill", "goal", "experience", "deadline"],
+    "next_question": "Es gab einen Fehler beim Verarbeiten. Können Sie mir bitte nochmal Ihre Informationen geben?",
+    "error": str(error)
+  }
+
+
+# --- Rule-based pre-extraction -------------------------------------------------
+
+_NUMBER_WORDS = r"\d+|ein|eine|einen|einem|zwei|drei|vier|fünf|sechs|sieben|acht|neun|zehn|zwölf|a|an|one|two|three|four|five|six|seven|eight|nine|ten|twelve"
+_MONTHS = r"januar|februar|märz|april|mai|juni|juli|august|september|oktober|november|dezember|january|february|march|may|june|july|october|december"
+
+_DURATION_UNITS = r"(?:tag|tage|tagen|woche|wochen|monat|monate|monaten|jahr|jahre|jahren|days?|weeks?|months?|years?)"
+# "2 years ago", "3 Jahre Erfahrung", "5 years of experience"
+_NOT_A_DEADLINE = r"\s+(?:ago|(?:of\s+)?(?:\w+\s+)?(?:erfahrung|experience))"
+
+# (pattern, confidence) - the matched text becomes the deadline
+_DEADLINE_PATTERNS = [
+  # "in zwei Wochen", "innerhalb von 3 Monaten", "within 6 months" - only with a prefix is it a deadline
+  (re.compile(rf"\b(?:innerhalb von|innerhalb|in the next|within|in)\s+(?:{_NUMBER_WORDS})\s+{_DURATION_UNITS}\b(?!{_NOT_A_DEADLINE})", re.IGNORECASE), 0.9),
+  # Bare "3 Monate" - could as well be a duration of practice, only a hint for the LLM.
+  # "seit/since/for 2 years" and "vor 2 Jahren" describe the past, never a deadline
+  (re.compile(rf"(?<!\bseit\s)(?<!\bsince\s)(?<!\bfor\s)(?<!\bvor\s)\b(?:{_NUMBER_WORDS})\s+{_DURATION_UNITS}\b(?!{_NOT_A_DEADLINE})", re.IGNORECASE), 0.5),
+  # "bis Ende 2026", "bis März 2026", "by the end of 2026", "until June 2026"
+  (re.compile(rf"\b(?:bis|by|until|before)\s+(?:(?:zum\s+|the\s+)?(?:ende|anfang|mitte|end|beginning|middle)\s+(?:of\s+)?)?(?:(?:{_MONTHS})\s+)?\d{{4}}\b", re.IGNORECASE), 0.9),
+  # "bis 31.12.2026"
+  (re.compile(r"\b(?:bis|by|until)\s+\d{1,2}\.\d{1,2}\.\d{2,4}\b", re.IGNORECASE), 0.9),
+  # "bis nächsten Sommer", "by next month" - vague, only a hint for the LLM
+  (re.compile(r"\b(?:bis|by)\s+(?:zum\s+)?(?:nächste[nmrs]?|naechste[nmrs]?|next|ende|end of)\s+\w+", re.IGNORECASE), 0.6),
+]
+
+# (pattern, canonical value, confidence)
+_EXPERIENCE_LEXICON = [
+  (re.compile(r"\b(?:anfänger(?:in)?|einsteiger(?:in)?|neuling|blutige[rn]? anfänger|keine(?:rlei)? (?:vor)?kenntnisse|keine erfahrung|noch nie|von null)\b", re.IGNORECASE), "Anfänger", 0.9),
+  (re.compile(r"\b(?:beginner|newbie|novice|no experience|never (?:done|tried|used)|from scratch)\b", re.IGNORECASE), "Beginner", 0.9),
+  (re.compile(r"\b(?:grundkenntnisse|ein bisschen|etwas erfahrung|leicht fortgeschritten)\b", re.IGNORECASE), "Grundkenntnisse", 0.85),
+  (re.compile(r"\b(?:basic knowledge|some experience|a little)\b", re.IGNORECASE), "Basic knowledge", 0.85),
+  (re.compile(r"\b(?:fortgeschritten(?:e[rn]?)?|mittleres niveau)\b", re.IGNORECASE), "Fortgeschritten", 0.9),
+  (re.compile(r"\b(?:intermediate|advanced)\b", re.IGNORECASE), "Intermediate", 0.85),
+  (re.compile(r"\b(?:experte|expertin|profi)\b", re.IGNORECASE), "Experte", 0.9),
+  (re.compile(r"\b(?:expert|professional)\b", re.IGNORECASE), "Expert", 0.8),
+]
+
+# "seit 2019", "since 2019", "3 Jahre Erfahrung", "5 years of experience"
+_EXPERIENCE_PATTERNS = [
+  (re.compile(r"\b(?:seit|since)\s+(?:19|20)\d{2}\b", re.IGNORECASE), 0.9),
+  (re.compile(r"\b\d+\s+(?:jahre?n?|monate?n?)\s+(?:\w+\s+)?erfahrung\b", re.IGNORECASE), 0.9),
+  (re.compile(r"\b\d+\s+(?:years?|months?)\s+(?:of\s+)?(?:\w+\s+)?experience\b", re.IGNORECASE), 0.9),
+]
+
+# Skills that are recognized by name; matched case-insensitively as whole words
+_SKILL_LEXICON = {
+  "python": "Python", "javascript": "JavaScript", "typescript": "TypeScript", "java": "Java",
+  "kotlin": "Kotlin", "swift": "Swift", "rust": "Rust", "c++": "C++", "c#": "C#",
+  "react": "React", "react native": "React Native", "angular": "Angular", "vue": "Vue",
+  "django": "Django", "flask": "Flask", "fastapi": "FastAPI", "node.js": "Node.js", "sql": "SQL",
+  "html": "HTML", "css": "CSS", "docker": "Docker", "kubernetes": "Kubernetes", "excel": "Excel",
+  "machine learning": "Machine Learning", "data science": "Data Science", "photoshop": "Photoshop",
+  "gitarre": "Gitarre", "guitar": "Guitar", "klavier": "Klavier", "piano": "Piano",
+  "schlagzeug": "Schlagzeug", "drums": "Drums", "geige": "Geige", "violin": "Violin", "singen": "Singen",
+  "englisch": "Englisch", "english": "English", "spanisch": "Spanisch", "spanish": "Spanish",
+  "französisch": "Französisch", "french": "French", "italienisch": "Italienisch", "italian": "Italian",
+  "japanisch": "Japanisch", "japanese": "Japanese", "chinesisch": "Chinesisch", "deutsch": "Deutsch",
+  "german": "German", "kochen": "Kochen", "cooking": "Cooking", "backen": "Backen", "baking": "Baking",
+  "schach": "Schach", "chess": "Chess", "zeichnen": "Zeichnen", "drawing": "Drawing",
+  "fotografie": "Fotografie", "photography": "Photography", "yoga": "Yoga", "schwimmen": "Schwimmen",
+  "swimming": "Swimming", "laufen": "Laufen", "running": "Running", "marathon": "Marathon",
+}
+_SKILL_LEXICON_PATTERN = re.compile(
+  r"(?<![\w+#.])(" + "|".join(re.escape(name) for name in sorted(_SKILL_LEXICON, key=len, reverse=True)) + r")(?![\w+#])",
+  re.IGNORECASE
+)
+_SKILL_PATTERNS = [
+  # "ich möchte Gitarre lernen", "Python zu lernen"
+  re.compile(r"\b([A-ZÄÖÜ][\wäöüß+#.]*(?:\s+[A-ZÄÖÜ][\wäöüß+#.]*)?)\s+(?:zu\s+)?lernen\b"),
+  # "learn Rust", "learn to play the piano"
+  re.compile(r"\blearn(?:ing)?\s+(?:to\s+(?:play|speak|use)\s+)?(?:the\s+)?([\w+#.]+)", re.IGNORECASE),
+]
+_SKILL_STOPWORDS = {"ich", "es", "etwas", "mehr", "neues", "das", "den", "die", "something", "more", "how", "to", "it", "a", "the"}
+
+# Explicit goal markers; the captured text up to the end of the sentence becomes the goal
+_GOAL_PATTERNS = [
+  (re.compile(r"\bmein (?:ziel|wunsch) ist(?:\s+es)?,?\s+(.+?)(?:[.!?\n]|$)", re.IGNORECASE), 0.9),
+  (re.compile(r"\bich (?:möchte|will) (?:gerne? )?(?:in der lage sein,?\s+)?(.+?\s+(?:können|bauen|erstellen|entwickeln|bestehen|spielen|sprechen|laufen|schaffen))\b", re.IGNORECASE), 0.8),
+  (re.compile(r"\b(?:damit ich|sodass ich|so dass ich)\s+(.+?)(?:[.!?\n]|$)", re.IGNORECASE), 0.85),
+  (re.compile(r"\bum\s+(.+?\s+zu\s+\w+)", re.IGNORECASE), 0.85),
+  (re.compile(r"\bmy goal is(?:\s+to)?\s+(.+?)(?:[.!?\n]|$)", re.IGNORECASE), 0.9),
+  (re.compile(r"\b(?:so that i can|so i can|in order to)\s+(.+?)(?:[.!?\n]|$)", re.IGNORECASE), 0.85),
+  (re.compile(r"\bi want to (?:be able to\s+)?(.+?)(?:[.!?\n]|$)", re.IGNORECASE), 0.7),
+]
+
+
+def _extract_skill(message: str):
+  names = {_SKILL_LEXICON[match.group(1).lower()] for match in _SKILL_LEXICON_PATTERN.finditer(message)}
+  if len(names) == 1:
+    return names.pop(), 0.9
+  for pattern in _SKILL_PATTERNS:
+    match = pattern.search(message)
+    if match and match.group(1).lower() not in _SKILL_STOPWORDS:
+      # Several lexicon hits make the learn-pattern the better evidence, but still not a sure one
+      return match.group(1).strip(), 0.7
+  if names:
+    return sorted(names)[0], 0.5
+  return None
+
+
+def _extract_experience(message: str):
+  for pattern, confidence in _EXPERIENCE_PATTERNS:
+    match = pattern.search(message)
+    if match:
+      return match.group(0).strip(), confidence
+  for pattern, value, confidence in _EXPERIENCE_LEXICON:
+    if pattern.search(message):
+      return value, confidence
+  return None
+
+
+def _extract_deadline(message: str):
+  # Most confident match wins - a bare duration must not hide an explicit "bis Ende 2026"
+  best = None
+  for pattern, confidence in _DEADLINE_PATTERNS:
+    match = pattern.search(message)
+    if match and (best is None or confidence > best[1]):
+      best = (match.group(0).strip(), confidence)
+  return best
+
+
+def _extract_goal(message: str):
+  for pattern, confidence in _GOAL_PATTERNS:
+    match = pattern.search(message)
+    if match and len(match.group(1).split()) >= 2:
+      return match.group(1).strip(" ,"), confidence
+  return None
+
+
+_FIELD_EXTRACTORS = {
+  "skill": _extract_skill,
+  "goal": _extract_goal,
+  "experience": _extract_experience,
+  "deadline": _extract_deadline,
+}
+
+
+def extract_skill_data(message: str) -> Dict[str, Dict]:
+  """
+  Regelbasierte Vorextraktion (deutsch/englisch) - liefert je erkanntem Feld
+  {"value": ..., "confidence": 0..1}
+  """
+  extracted = {}
+  for field, extractor in _FIELD_EXTRACTORS.items():
+    result = extractor(message or "")
+    if result:
+      extracted[field] = {"value": result[0], "confidence": result[1]}
+  return extracted
+
+
+extractor_counters = {
+  "messages": 0,
+  "llm_skipped": 0,
+  "llm_calls": 0,
+  "llm_seconds": 0.0,
+  "fields_prefilled": {field: 0 for field in COLLECTOR_FIELDS},
+}
+
+
+def extractor_stats() -> Dict:
+  """Trefferquoten der Vorextraktion und die dadurch eingesparte LLM-Zeit (geschätzt)"""
+  messages = extractor_counters["messages"]
+  llm_calls = extractor_counters["llm_calls"]
+  avg_llm_seconds = extractor_counters["llm_seconds"] / llm_calls if llm_calls else 0.0
+  return {
+    "enabled": COLLECTOR_EXTRACTOR_ENABLED,
+    "min_confidence": COLLECTOR_EXTRACTOR_MIN_CONFIDENCE,
+    "messages": messages,
+    "llm_skipped": extractor_counters["llm_skipped"],
+    "skip_rate": extractor_counters["llm_skipped"] / messages if messages else 0.0,
+    "field_hit_rates": {
+      field: count / messages if messages else 0.0
+      for field, count in extractor_counters["fields_prefilled"].items()
+    },
+    "avg_llm_seconds": avg_llm_seconds,
+    "estimated_seconds_saved": extractor_counters["llm_skipped"] * avg_llm_seconds,
+  }
+
+
+def _prefill(input) -> Tuple[Dict, Optional[Dict]]:
+  """
+  Ergänzt leere Felder um sicher erkannte Werte aus der Nachricht.
+  Gibt (input, lokale Antwort) zurück - die Antwort ist gesetzt, wenn
+  danach alle Felder gefüllt sind und der LLM-Aufruf entfallen kann.
+  """
+  if not COLLECTOR_EXTRACTOR_ENABLED:
+    return input, None
+
+  extractor_counters["messages"] += 1
+  prefilled = dict(input)
+  filled_fields = []
+  for field, result in extract_skill_data(input.get('message', '')).items():
+    if (input.get(field) or '').strip() or result["confidence"] < COLLECTOR_EXTRACTOR_MIN_CONFIDENCE:
+      continue
+    prefilled[field] = result["value"]
+    filled_fields.append(field)
+    extractor_counters["fields_prefilled"][field] += 1
+
+  # Only skip when the extractor completed the data - a message to already complete data may be a correction
+  if filled_fields and all((prefilled.get(field) or '').strip() for field in COLLECTOR_FIELDS):
+    extractor_counters["llm_skipped"] += 1
+    return prefilled, {
+      "status": "complete",
+      "current_data": {field: prefilled[field] for field in COLLECTOR_FIELDS},
+      "missing_fields": [],
+      "next_question": None
+    }
+
+  return prefilled, None
+
+
+def _record_llm_call(started: float):
+  extractor_counters["llm_calls"] += 1
+  extractor_counters["llm_seconds"] += time.perf_counter() - started
+
+
+def collect_information(input) -> Dict:
+  input, local_response = _prefill(input)
+  if local_response is not None:
+    return local_response
+
+  chain = get_chain("collector")
+  started = time.perf_counter()
+  response, raw, error = invoke_structured(chain, _collector_inputs(input), CollectorResponse)
+  _record_llm_call(started)
+  return _parse_collector_response(input, response, raw, error)
+
+
+async def acollect_information(input) -> Dict:
+  """
+  Async variant of collect_information - awaits the LLM without blocking the event loop
+  """
+  input, local_response = _prefill(input)
+  if local_response is not None:
+    return local_response
+
+  chain = get_chain("collector")
+  started = time.perf_counter()
+  response, raw, error = await ainvoke_structured(chain, _collector_inputs(input), CollectorResponse)
+  _record_llm_call(started)
+  return _parse_collector_response(input, response, raw, error)
 
 
 def start_skill_collection(message: str) -> Dict:
   """
   Startet den Informationssammlungsprozess mit einer leeren Datenbasis
   """
-  return collect_information({
+  return collect_information(_start_input(message))
+
+
+def continue_skill_collection(current_data: Dict, new_message: str) -> Dict:
+  """
+  Setzt den Sammlungsprozess mit bereits vorhandenen Daten fort
+  """
+  return collect_information(_continue_input(current_data, new_message))
+
+
+def _start_input(message: str) -> Dict:
+  return {
     'skill': '',
     'goal': '',
     'experience': '',
     'deadline': '',
     'message': message
-  })
+  }
 
 
-def continue_skill_collection(current_data: Dict, new_message: str) -> Dict:
-  """
-  Setzt den Sammlungsprozess mit bereits vorhandenen Daten fort
-  """
-  return collect_information({
+def _continue_input(current_data: Dict, new_message: str) -> Dict:
+  return {
     'skill': current_data.get('skill', ''),
     'goal': current_data.get('goal', ''),
     'experience': current_data.get('experience', ''),
     'deadline': current_data.get('deadline', ''),
     'message': new_message
-  })
\ No newline at end of file
+  }
+
+
+async def astart_skill_collection(message: str) -> Dict:
+  """
+  Async variant of start_skill_collection
+  """
+  return await acollect_information(_start_input(message))
+
+
+async def acontinue_skill_collection(current_data: Dict, new_message: str) -> Dict:
+  """
+  Async variant of continue_skill_collection
+  """
+  return await acollect_information(_continue_input(current_data, new_message))
@@ -1,14 +1,29 @@
-from langchain.chat_models import init_chat_model
 from langchain_core.prompts import PromptTemplate
-from langchain_core.output_parsers import PydanticOutputParser
 from pydantic import BaseModel, Field, field_validator
-from typing import List, Dict
+from typing import AsyncIterator, List, Dict, Optional, Tuple
 from dotenv import load_dotenv
+from ai.backends import get_chat_model
+from ai.chains import get_chain, register_chain
 from ai.prompts import GENERATOR_PROMPT
-import os
+from ai.llm import ainvoke_structured, astream_limited, invoke_structured, json_schema_response_format, record_fallback, record_parse
+from ai.stream_parser import SkillPlanStreamParser, SCALAR_FIELDS
+from ai.plan_cache import plan_cache, plan_cache_key, PLAN_CACHE_ENABLED
+import re
 load_dotenv()
 
 
+# Allowed Lucide icons, in the order they are listed in error messages
+ALLOWED_ICONS = (
+    "code", "book", "star", "target", "laptop", "brain", "chart-bar",
+    "graduation-cap", "heart", "zap", "trophy", "clock", "play",
+    "bookmark", "lightbulb", "settings", "terminal", "database",
+    "globe", "smartphone"
+)
+_ALLOWED_ICON_SET = frozenset(ALLOWED_ICONS)
+_ALLOWED_ICONS_MESSAGE = f"Icon must be one of: {', '.join(ALLOWED_ICONS)}"
+_COLOR_PATTERN = re.compile(r'^hsl\(\d+,\s*64%,\s*62%\)$')
+
+
 class TodoItem(BaseModel):
     status: bool = Field(False, description="Completion status of the todo")
     text: str = Field(..., description="Description of the todo task")
@@ -24,28 +39,95 @@ class SkillItem(BaseModel):
     
     @field_validator('icon')
     def validate_lucide_icon(cls, v):
-        # List of allowed Lucide icons
-        allowed_icons = [
-            "code", "book", "star", "target", "laptop", "brain", "chart-bar",
-            "graduation-cap", "heart", "zap", "trophy", "clock", "play",
-            "bookmark", "lightbulb", "settings", "terminal", "database",
-            "globe", "smartphone"
-        ]
-        if v not in allowed_icons:
-            raise ValueError(f"Icon must be one of: {', '.join(allowed_icons)}")
+        if v not in _ALLOWED_ICON_SET:
+            raise ValueError(_ALLOWED_ICONS_MESSAGE)
         return v
     
     @field_validator('color')
     def validate_color_format(cls, v):
-        import re
-        if not re.match(r'^hsl\(\d+,\s*64%,\s*62%\)$', v):
+        if not _COLOR_PATTERN.match(v):
             raise ValueError("Color must be in format 'hsl(X, 64%, 62%)' where X is 0-360")
         return v
 
 
-generator_parser = PydanticOutputParser(pydantic_object=SkillItem)
+def _generator_prompt():
+    return PromptTemplate(
+        template=GENERATOR_PROMPT,
+        input_variables=["skill", "goal", "experience", "deadline"],
+    )
+
+
+def _build_generator_chain():
+    # The response schema is enforced by the provider instead of format instructions in the prompt
+    return _generator_prompt() | get_chat_model().with_structured_output(SkillItem, method="json_schema", include_raw=True)
+
+
+def _build_generator_stream_chain():
+    # Streaming needs the raw JSON text, so the schema is passed as response_format
+    return _generator_prompt() | get_chat_model().bind(response_format=json_schema_response_format(SkillItem))
+
+
+register_chain("generator", _build_generator_chain)
+register_chain("generator_stream", _build_generator_stream_chain)
+
+
+def _extract_skill_data(collector_data: Dict) -> Dict:
+    # Extract the current_data from collector output
+    skill_data = collector_data.get('current_data', {})
+    
+    # Validate that we have complete data
+    if collector_data.get('status') != 'complete':
+        raise ValueError("Cannot generate plan from incomplete collector data")
+
+    return skill_data
+
+
+def _generator_inputs(skill_data: Dict) -> Dict:
+    return {
+        "skill": skill_data.get('skill', ''),
+        "goal": skill_data.get('goal', ''),
+        "experience": skill_data.get('experience', ''),
+        "deadline": skill_data.get('deadline', '')
+    }
+
 
-llm = init_chat_model(model="gpt-4.1", api_key=os.environ.get("OPENAI_API_KEY"))
+def _fallback_plan(skill_data: Dict, error: Exception) -> Dict:
+    # Fallback: create a basic skill item
+    return {
+        "color": "hsl(200, 64%, 62%)",
+        "goal": skill_data.get('goal', 'Learn new skill'),
+        "icon": "book",
+        "tip": "Stay consistent and practice regularly",
+        "title": skill_data.get('skill', 'New Skill'),
+        "todos": [
+            {"status": False, "text": "Start learning basics"},
+            {"status": False, "text": "Practice daily"},
+            {"status": False, "text": "Build a project"},
+            {"status": False, "text": "Review and refine"}
+        ],
+        "error": str(error)
+    }
+
+
+def _parse_generator_response(skill_data: Dict, response: Optional[SkillItem], raw, error: Optional[Exception]) -> Dict:
+    if response is not None:
+        return response.model_dump()
+
+    # Structured output, local repair and the retry all failed
+    print(f"Error parsing generator response: {error}")
+    print(f"LLM response: {getattr(raw, 'content', raw)}")
+    record_fallback()
+    return _fallback_plan(skill_data, error)
+
+
+def _validate_stream_piece(name: str, value):
+    """
+    Validates a single streamed piece against SkillItem / TodoItem
+    """
+    if name == "todo":
+        return TodoItem.model_validate(value).model_dump()
+    SkillItem.__pydantic_validator__.validate_assignment(SkillItem.model_construct(), name, value)
+    return value
 
 
 def generate_skill_plan(collector_data: Dict) -> Dict:
@@ -58,55 +140,112 @@ def generate_skill_plan(collector_data: Dict) -> Dict:
     Returns:
         Dictionary containing the generated SkillItem
     """
+    skill_data = _extract_skill_data(collector_data)
+    chain = get_chain("generator")
+    response, raw, error = invoke_structured(chain, _generator_inputs(skill_data), SkillItem)
+    return _parse_generator_response(skill_data, response, raw, error)
+
+
+async def agenerate_skill_plan(collector_data: Dict, use_cache: bool = True) -> Dict:
+    """
+    Async variant of generate_skill_plan - awaits the LLM without blocking the event loop
     
-    # Extract the current_data from collector output
-    skill_data = collector_data.get('current_data', {})
-    
-    # Validate that we have complete data
-    if collector_data.get('status') != 'complete':
-        raise ValueError("Cannot generate plan from incomplete collector data")
+    Args:
+        collector_data: Dictionary containing status, current_data, etc. from collector
+        use_cache: Serve identical requests from the plan cache; False forces regeneration
+        
+    Returns:
+        Dictionary containing the generated SkillItem
+    """
+    skill_data = _extract_skill_data(collector_data)
+    cache_key = plan_cache_key(skill_data)
+
+    if use_cache and PLAN_CACHE_ENABLED:
+        cached = await plan_cache.get(cache_key)
+        if cached is not None:
+            return cached
+    elif PLAN_CACHE_ENABLED:
+        plan_cache.record_bypass()
+
+    chain = get_chain("generator")
+    response, raw, error = await ainvoke_structured(chain, _generator_inputs(skill_data), SkillItem)
+    result = _parse_generator_response(skill_data, response, raw, error)
+
+    # Fallback-Pläne werden nicht gecacht
+    if PLAN_CACHE_ENABLED and "error" not in result:
+        await plan_cache.put(cache_key, result)
+    return result
+
+
+async def astream_skill_plan(collector_data: Dict, use_cache: bool = True) -> AsyncIterator[Tuple[str, object]]:
+    """
+    Streams a skill plan piece by piece as the LLM produces it
     
-    generator_prompt = PromptTemplate(
-        template=GENERATOR_PROMPT,
-        input_variables=["skill", "goal", "experience", "deadline"],
-        partial_variables={
-            "formation_template": generator_parser.get_format_instructions()
-        },
-    )
+    Args:
+        collector_data: Dictionary containing status, current_data, etc. from collector
+        use_cache: Replay cached plans instantly; False forces regeneration
+        
+    Yields:
+        (event, data) tuples: one per scalar SkillItem field, one "todo" per
+        finished todo entry, "error" for pieces that failed validation and a
+        final "done" carrying the complete (or fallback) SkillItem
+    """
+    skill_data = _extract_skill_data(collector_data)
+    cache_key = plan_cache_key(skill_data)
 
-    chain = generator_prompt | llm 
+    if use_cache and PLAN_CACHE_ENABLED:
+        cached = await plan_cache.get(cache_key)
+        if cached is not None:
+            for field in SCALAR_FIELDS:
+                yield field, cached[field]
+            for index, item in enumerate(cached["todos"]):
+                yield "todo", {"index": index, "item": item}
+            yield "done", cached
+            return
+    elif PLAN_CACHE_ENABLED:
+        plan_cache.record_bypass()
 
-    llm_res = chain.invoke({
-        "skill": skill_data.get('skill', ''),
-        "goal": skill_data.get('goal', ''),
-        "experience": skill_data.get('experience', ''),
-        "deadline": skill_data.get('deadline', '')
-    })
+    chain = get_chain("generator_stream")
+    stream_parser = SkillPlanStreamParser()
+    todo_index = 0
+
+    async def validated(pieces):
+        nonlocal todo_index
+        for name, value in pieces:
+            try:
+                value = _validate_stream_piece(name, value)
+            except Exception as e:
+                yield "error", {"field": name, "detail": str(e)}
+                continue
+            if name == "todo":
+                yield "todo", {"index": todo_index, "item": value}
+                todo_index += 1
+            else:
+                yield name, value
+
+    async for chunk in astream_limited(chain, _generator_inputs(skill_data)):
+        async for event in validated(stream_parser.feed(chunk.content)):
+            yield event
+
+    pieces, document = stream_parser.finish()
+    async for event in validated(pieces):
+        yield event
 
     try:
-        # Parse the response using the SkillItem structure
-        response = generator_parser.parse(llm_res.content)
-        return response.model_dump()
+        result = SkillItem.model_validate(document).model_dump()
     except Exception as e:
-        print(f"Error parsing generator response: {e}")
-        print(f"LLM response: {llm_res.content}")
-        
-        # Fallback: create a basic skill item
-        return {
-            "color": "hsl(200, 64%, 62%)",
-            "goal": skill_data.get('goal', 'Learn new skill'),
-            "icon": "book",
-            "tip": "Stay consistent and practice regularly",
-            "title": skill_data.get('skill', 'New Skill'),
-            "todos": [
-                {"status": False, "text": "Start learning basics"},
-                {"status": False, "text": "Practice daily"},
-                {"status": False, "text": "Build a project"},
-                {"status": False, "text": "Review and refine"}
-            ],
-            "error": str(e),
-            "raw_response": llm_res.content
-        }
+        print(f"Error parsing streamed generator response: {e}")
+        print(f"LLM response: {stream_parser.buffer}")
+        # The stream is parsed here, not by parse_structured
+        record_parse(False)
+        record_fallback()
+        yield "done", _fallback_plan(skill_data, e)
+        return
+
+    record_parse(True)
+    if PLAN_CACHE_ENABLED:
+        await plan_cache.put(cache_key, result)
+    yield "done", result
 
 
 if __name__ == "__main__":
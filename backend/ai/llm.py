@@ -0,0 +1,242 @@
+import asyncio
+import json
+import os
+import re
+import time
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import AsyncIterator, Dict, Optional, Tuple, Type
+
+from langchain_core.utils.json import parse_partial_json
+from pydantic import BaseModel
+
+from metrics import registry
+
+
+# Maximale Anzahl gleichzeitig laufender LLM-Aufrufe pro Worker
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "16"))
+
+# Weitere LLM-Aufrufe, wenn eine strukturierte Antwort auch nach der Reparatur ungültig ist
+LLM_STRUCTURED_RETRIES = int(os.getenv("LLM_STRUCTURED_RETRIES", "1"))
+
+# Larger responses are not worth repairing locally
+REPAIR_MAX_CHARS = 64 * 1024
+
+_llm_semaphore = None
+
+# Route on whose behalf LLM calls are made - set per request by the AI router
+llm_route: ContextVar[str] = ContextVar("llm_route", default="unknown")
+
+TOKEN_BUCKETS = (50, 100, 250, 500, 1000, 2000, 4000, 8000, 16000, 32000)
+
+LLM_CALLS = registry.counter("llm_calls_total", "LLM calls by outcome", ["route", "model", "outcome"])
+LLM_LATENCY = registry.histogram("llm_latency_seconds", "Duration of LLM calls", ["route", "model"])
+LLM_QUEUE_WAIT = registry.histogram("llm_queue_wait_seconds", "Time spent waiting for a free LLM slot", ["route"])
+LLM_TOKENS = registry.counter("llm_tokens_total", "Tokens used, by kind (prompt, completion, cached)", ["route", "model", "kind"])
+LLM_PROMPT_TOKENS = registry.histogram("llm_prompt_tokens", "Prompt tokens per call", ["route"], TOKEN_BUCKETS)
+LLM_COMPLETION_TOKENS = registry.histogram("llm_completion_tokens", "Completion tokens per call", ["route"], TOKEN_BUCKETS)
+LLM_PARSES = registry.counter("llm_parse_total", "Parsing of LLM responses", ["route", "result"])
+LLM_FALLBACKS = registry.counter("llm_fallback_total", "Responses replaced by a fallback", ["route"])
+
+
+def get_llm_semaphore() -> asyncio.Semaphore:
+    """
+    Returns the process-wide semaphore limiting in-flight LLM calls
+    """
+    global _llm_semaphore
+    if _llm_semaphore is None:
+        _llm_semaphore = asyncio.Semaphore(LLM_MAX_CONCURRENCY)
+    return _llm_semaphore
+
+
+@asynccontextmanager
+async def llm_slot():
+    """
+    Waits for a free LLM slot so that bursts of AI requests queue up
+    instead of opening an unbounded number of provider connections
+    """
+    started = time.perf_counter()
+    async with get_llm_semaphore():
+        LLM_QUEUE_WAIT.observe(time.perf_counter() - started, route=llm_route.get())
+        yield
+
+
+def record_llm_call(message, started: float, error: Optional[Exception] = None):
+    """
+    Records latency and token usage of one LLM call from the message's
+    usage_metadata / response_metadata
+    """
+    route = llm_route.get()
+    latency = time.perf_counter() - started
+    if isinstance(message, dict):
+        # with_structured_output(include_raw=True) wraps the model's message
+        message = message.get("raw")
+    metadata = getattr(message, "response_metadata", None) or {}
+    model = metadata.get("model_name") or metadata.get("model") or "unknown"
+
+    LLM_CALLS.inc(route=route, model=model, outcome="error" if error else "ok")
+    LLM_LATENCY.observe(latency, route=route, model=model)
+
+    usage = getattr(message, "usage_metadata", None)
+    if not usage:
+        return
+    prompt_tokens = usage.get("input_tokens", 0)
+    completion_tokens = usage.get("output_tokens", 0)
+    cached_tokens = (usage.get("input_token_details") or {}).get("cache_read", 0)
+
+    LLM_TOKENS.inc(prompt_tokens, route=route, model=model, kind="prompt")
+    LLM_TOKENS.inc(completion_tokens, route=route, model=model, kind="completion")
+    LLM_TOKENS.inc(cached_tokens, route=route, model=model, kind="cached")
+    LLM_PROMPT_TOKENS.observe(prompt_tokens, route=route)
+    LLM_COMPLETION_TOKENS.observe(completion_tokens, route=route)
+
+
+def record_parse(success: bool, repaired: bool = False):
+    """
+    Records whether an LLM response could be parsed
+    """
+    LLM_PARSES.inc(route=llm_route.get(), result="repaired" if repaired else "success" if success else "failure")
+
+
+def record_fallback():
+    """
+    Records that a fallback was served instead of the LLM response. The parse
+    failures leading to it are recorded separately (parse_structured does that)
+    """
+    LLM_FALLBACKS.inc(route=llm_route.get())
+
+
+def json_schema_response_format(schema: Type[BaseModel]) -> Dict:
+    """
+    OpenAI response_format constraining the output to the model's JSON schema
+    (for streaming, where with_structured_output cannot be used)
+    """
+    return {
+        "type": "json_schema",
+        "json_schema": {"name": schema.__name__, "schema": schema.model_json_schema()},
+    }
+
+
+_CODE_FENCE = re.compile(r"^```(?:json)?\s*|\s*```\s*$", re.IGNORECASE)
+_TRAILING_COMMA = re.compile(r",\s*([}\]])")
+
+
+def repair_json(text: str) -> Optional[Dict]:
+    """
+    Bounded local repair of almost-JSON: strips code fences and surrounding
+    prose, removes trailing commas and closes truncated strings/brackets.
+    Returns None when the text cannot be turned into a JSON object.
+    """
+    if not text or len(text) > REPAIR_MAX_CHARS:
+        return None
+    text = _CODE_FENCE.sub("", text.strip())
+    start = text.find("{")
+    if start == -1:
+        return None
+    end = text.rfind("}")
+    candidate = text[start:end + 1] if end > start else text[start:]
+    candidate = _TRAILING_COMMA.sub(r"\1", candidate)
+    try:
+        repaired = json.loads(candidate)
+    except ValueError:
+        # Truncated output - parse_partial_json closes open strings and brackets
+        repaired = parse_partial_json(_TRAILING_COMMA.sub(r"\1", text[start:]))
+    return repaired if isinstance(repaired, dict) else None
+
+
+def parse_structured(result: Dict, schema: Type[BaseModel]) -> Tuple[Optional[BaseModel], Optional[Exception]]:
+    """
+    Takes the output of with_structured_output(include_raw=True) and returns
+    (parsed model, None) - repairing the raw content locally if the
+    provider's parse failed - or (None, error)
+    """
+    if result.get("parsed") is not None:
+        record_parse(True)
+        return result["parsed"], None
+
+    error = result.get("parsing_error") or ValueError("Empty structured response")
+    raw = result.get("raw")
+    repaired = repair_json(getattr(raw, "content", None) or "")
+    if repaired is not None:
+        try:
+            parsed = schema.model_validate(repaired)
+        except Exception as e:
+            error = e
+        else:
+            record_parse(True, repaired=True)
+            return parsed, None
+
+    record_parse(False)
+    return None, error
+
+
+def invoke_recorded(chain, inputs: dict):
+    """
+    Runs chain.invoke(inputs) and records the call
+    """
+    started = time.perf_counter()
+    try:
+        message = chain.invoke(inputs)
+    except Exception as e:
+        record_llm_call(None, started, e)
+        raise
+    record_llm_call(message, started)
+    return message
+
+
+async def ainvoke_limited(chain, inputs: dict):
+    """
+    Runs chain.ainvoke(inputs) inside an LLM slot and records the call
+    """
+    async with llm_slot():
+        started = time.perf_counter()
+        try:
+            message = await chain.ainvoke(inputs)
+        except Exception as e:
+            record_llm_call(None, started, e)
+            raise
+    record_llm_call(message, started)
+    return message
+
+
+async def astream_limited(chain, inputs: dict) -> AsyncIterator:
+    """
+    Streams chain.astream(inputs) inside an LLM slot and records the call
+    once the stream is exhausted (usage arrives with the last chunks)
+    """
+    async with llm_slot():
+        started = time.perf_counter()
+        aggregate = None
+        try:
+            async for chunk in chain.astream(inputs):
+                aggregate = chunk if aggregate is None else aggregate + chunk
+                yield chunk
+        except Exception as e:
+            record_llm_call(aggregate, started, e)
+            raise
+    record_llm_call(aggregate, started)
+
+
+def invoke_structured(chain, inputs: dict, schema: Type[BaseModel]) -> Tuple[Optional[BaseModel], object, Optional[Exception]]:
+    """
+    Runs a structured-output chain with local repair and up to
+    LLM_STRUCTURED_RETRIES retries. Returns (parsed, raw message, error)
+    """
+    for _ in range(LLM_STRUCTURED_RETRIES + 1):
+        result = invoke_recorded(chain, inputs)
+        parsed, error = parse_structured(result, schema)
+        if parsed is not None:
+            break
+    return parsed, result.get("raw"), error
+
+
+async def ainvoke_structured(chain, inputs: dict, schema: Type[BaseModel]) -> Tuple[Optional[BaseModel], object, Optional[Exception]]:
+    """
+    Async variant of invoke_structured
+    """
+    for _ in range(LLM_STRUCTURED_RETRIES + 1):
+        result = await ainvoke_limited(chain, inputs)
+        parsed, error = parse_structured(result, schema)
+        if parsed is not None:
+            break
+    return parsed, result.get("raw"), error
@@ -0,0 +1,131 @@
+import hashlib
+import json
+import os
+import re
+import time
+import unicodedata
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from ai.prompts import PROMPT_VERSION
+from database import db
+
+
+PLAN_CACHE_ENABLED = os.getenv("PLAN_CACHE_ENABLED", "1") not in ("0", "false", "False")
+PLAN_CACHE_MAX_ENTRIES = int(os.getenv("PLAN_CACHE_MAX_ENTRIES", "1024"))
+PLAN_CACHE_TTL_SECONDS = int(os.getenv("PLAN_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+PLAN_CACHE_COLLECTION = "generated_plans"
+
+_WHITESPACE = re.compile(r"\s+")
+_CACHE_KEY_FIELDS = ("skill", "goal", "experience", "deadline")
+
+
+def _normalize(value) -> str:
+    text = unicodedata.normalize("NFKC", str(value or ""))
+    text = _WHITESPACE.sub(" ", text).strip().lower()
+    return text.rstrip(".!?")
+
+
+def plan_cache_key(skill_data: Dict) -> str:
+    """
+    Hash over the normalized collector fields plus the prompt version
+    """
+    normalized = [_normalize(skill_data.get(field)) for field in _CACHE_KEY_FIELDS]
+    payload = json.dumps([PROMPT_VERSION] + normalized, ensure_ascii=False)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class PlanCache:
+    """
+    Two-tier cache for generated SkillItem plans: an in-process LRU with TTL
+    in front of a MongoDB collection whose documents expire via a TTL index.
+    """
+
+    def __init__(self, collection_name: str, max_entries: int, ttl_seconds: int):
+        self.collection_name = collection_name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self.counters = {
+            "memory_hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "stores": 0,
+            "bypasses": 0,
+            "errors": 0,
+        }
+
+    @property
+    def collection(self):
+        return db.get_collection(self.collection_name)
+
+    def _memory_get(self, key: str) -> Optional[Dict]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, plan = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return plan
+
+    def _memory_put(self, key: str, plan: Dict):
+        self._entries[key] = (time.monotonic() + self.ttl_seconds, plan)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Dict]:
+        plan = self._memory_get(key)
+        if plan is not None:
+            self.counters["memory_hits"] += 1
+            return plan
+
+        try:
+            document = await self.collection.find_one({"_id": key}, {"plan": 1})
+        except Exception as e:
+            print(f"Error reading plan cache: {e}")
+            self.counters["errors"] += 1
+            document = None
+
+        if document is None:
+            self.counters["misses"] += 1
+            return None
+
+        self.counters["mongo_hits"] += 1
+        self._memory_put(key, document["plan"])
+        return document["plan"]
+
+    async def put(self, key: str, plan: Dict):
+        self._memory_put(key, plan)
+        try:
+            await self.collection.replace_one(
+                {"_id": key},
+                {"plan": plan, "prompt_version": PROMPT_VERSION, "created_at": datetime.now(timezone.utc)},
+                upsert=True,
+            )
+            self.counters["stores"] += 1
+        except Exception as e:
+            print(f"Error writing plan cache: {e}")
+            self.counters["errors"] += 1
+
+    def record_bypass(self):
+        self.counters["bypasses"] += 1
+
+    def stats(self) -> Dict:
+        hits = self.counters["memory_hits"] + self.counters["mongo_hits"]
+        lookups = hits + self.counters["misses"]
+        return {
+            **self.counters,
+            "hit_rate": hits / lookups if lookups else 0.0,
+            "memory_entries": len(self._entries),
+            "enabled": PLAN_CACHE_ENABLED,
+            "prompt_version": PROMPT_VERSION,
+        }
+
+
+plan_cache = PlanCache(PLAN_CACHE_COLLECTION, PLAN_CACHE_MAX_ENTRIES, PLAN_CACHE_TTL_SECONDS)
+
@@ -1,3 +1,6 @@
+# Bei jeder inhaltlichen Prompt-Änderung erhöhen - invalidiert gecachte Pläne
+PROMPT_VERSION = "2"
+
 COLLECTOR_PROMPT = """
 Du bist ein hilfreicher Assistent, der Informationen für eine Skill-Entwicklungsplanung sammelt.
 
@@ -12,8 +15,7 @@ Neue Benutzernachricht: {message}
 Analysiere die neue Nachricht und extrahiere alle verfügbaren Informationen. 
 Kombiniere sie mit den bereits vorhandenen Daten.
 
-WICHTIG: Du musst IMMER eine JSON-Antwort im folgenden Format zurückgeben:
-{formation_template}
+Antworte im vorgegebenen JSON-Schema (status, current_data, missing_fields, next_question).
 
 Regeln:
 1. BEWAHRE bereits vorhandene Informationen - überschreibe sie nur wenn der User explizit etwas Neues angibt
@@ -34,8 +36,7 @@ Eingabedaten:
 - Erfahrung: {experience}
 - Zeitrahmen: {deadline}
 
-Erstelle einen strukturierten SkillItem-Plan im folgenden Format:
-{formation_template}
+Erstelle einen strukturierten SkillItem-Plan im vorgegebenen JSON-Schema.
 
 Regeln:
 1. "title": Kurzer, prägnanter Titel für den Skill (z.B. "React Entwicklung", "Python Basics")
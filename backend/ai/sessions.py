@@ -0,0 +1,129 @@
+import os
+import time
+import uuid
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, Optional
+
+from database import db
+
+
+COLLECTOR_SESSION_MAX_ENTRIES = int(os.getenv("COLLECTOR_SESSION_MAX_ENTRIES", "4096"))
+COLLECTOR_SESSION_TTL_SECONDS = int(os.getenv("COLLECTOR_SESSION_TTL_SECONDS", str(24 * 3600)))
+COLLECTOR_SESSION_MAX_TURNS = int(os.getenv("COLLECTOR_SESSION_MAX_TURNS", "10"))
+
+COLLECTOR_SESSIONS_COLLECTION = "collector_sessions"
+
+
+def new_session_id() -> str:
+    return uuid.uuid4().hex
+
+
+class CollectorSessionStore:
+    """
+    Server-side state of /collect-session conversations: the collector's last
+    response plus the most recent turns, keyed by session_id.
+
+    MongoDB is the source of truth (documents expire via a TTL index on
+    updated_at), so a session can continue on any worker. Complete sessions
+    no longer change and are served from an in-process LRU; sessions that are
+    still collecting are always read from MongoDB, because the next turn
+    may have been handled by another worker.
+    """
+
+    def __init__(self, collection_name: str, max_entries: int, ttl_seconds: int, max_turns: int):
+        self.collection_name = collection_name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.max_turns = max_turns
+        self._complete = OrderedDict()
+        self.counters = {
+            "memory_hits": 0,
+            "mongo_hits": 0,
+            "misses": 0,
+            "saves": 0,
+            "llm_calls_skipped": 0,
+            "errors": 0,
+        }
+
+    @property
+    def collection(self):
+        return db.get_collection(self.collection_name)
+
+    def _memory_get(self, session_id: str) -> Optional[Dict]:
+        entry = self._complete.get(session_id)
+        if entry is None:
+            return None
+        expires_at, session = entry
+        if expires_at < time.monotonic():
+            del self._complete[session_id]
+            return None
+        self._complete.move_to_end(session_id)
+        return session
+
+    def _memory_put(self, session_id: str, session: Dict):
+        self._complete[session_id] = (time.monotonic() + self.ttl_seconds, session)
+        self._complete.move_to_end(session_id)
+        while len(self._complete) > self.max_entries:
+            self._complete.popitem(last=False)
+
+    async def get(self, session_id: str) -> Optional[Dict]:
+        session = self._memory_get(session_id)
+        if session is not None:
+            self.counters["memory_hits"] += 1
+            return session
+
+        try:
+            session = await self.collection.find_one({"_id": session_id})
+        except Exception as e:
+            print(f"Error reading collector session: {e}")
+            self.counters["errors"] += 1
+            session = None
+
+        if session is None:
+            self.counters["misses"] += 1
+            return None
+
+        self.counters["mongo_hits"] += 1
+        if session["response"].get("status") == "complete":
+            self._memory_put(session_id, session)
+        return session
+
+    async def save(self, session_id: str, session: Optional[Dict], message: str, response: Dict) -> Dict:
+        """Store the collector response of a turn and append the turn to the history."""
+        turns = list((session or {}).get("turns", []))
+        turns.append({"role": "user", "content": message})
+        if response.get("next_question"):
+            turns.append({"role": "assistant", "content": response["next_question"]})
+
+        stored_response = {key: value for key, value in response.items() if key != "session_id"}
+        updated = {
+            "_id": session_id,
+            "response": stored_response,
+            "turns": turns[-self.max_turns:],
+            "updated_at": datetime.now(timezone.utc),
+        }
+
+        if stored_response.get("status") == "complete":
+            self._memory_put(session_id, updated)
+        try:
+            await self.collection.replace_one({"_id": session_id}, updated, upsert=True)
+            self.counters["saves"] += 1
+        except Exception as e:
+            print(f"Error writing collector session: {e}")
+            self.counters["errors"] += 1
+        return updated
+
+    def record_skipped_llm_call(self):
+        self.counters["llm_calls_skipped"] += 1
+
+    def stats(self) -> Dict:
+        return {**self.counters, "memory_entries": len(self._complete)}
+
+
+session_store = CollectorSessionStore(
+    COLLECTOR_SESSIONS_COLLECTION,
+    COLLECTOR_SESSION_MAX_ENTRIES,
+    COLLECTOR_SESSION_TTL_SECONDS,
+    COLLECTOR_SESSION_MAX_TURNS,
+)
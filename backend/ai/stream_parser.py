@@ -0,0 +1,74 @@
+from typing import Dict, List, Tuple
+from langchain_core.utils.json import parse_partial_json
+
+
+# Reihenfolge der skalaren SkillItem-Felder, die vor den todos gestreamt werden
+SCALAR_FIELDS = ("title", "goal", "icon", "color", "tip")
+
+
+class SkillPlanStreamParser:
+    """
+    Incrementally parses a streamed SkillItem JSON document.
+
+    A top-level field counts as complete as soon as the model has started
+    the next key (JSON objects are emitted in order), a todo entry as soon
+    as the next entry has started. Everything still open is flushed by
+    finish() once the stream has ended.
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.emitted_fields = set()
+        self.emitted_todos = 0
+
+    def _parse_buffer(self):
+        start = self.buffer.find("{")
+        if start == -1:
+            return None
+        text = self.buffer[start:]
+        # Markdown-Codeblock-Ende abschneiden, falls das Modell eines sendet
+        fence = text.find("```")
+        if fence != -1:
+            text = text[:fence]
+        parsed = parse_partial_json(text)
+        return parsed if isinstance(parsed, dict) else None
+
+    def _collect(self, parsed: Dict, final: bool) -> List[Tuple[str, object]]:
+        pieces = []
+        keys = list(parsed.keys())
+
+        for field in SCALAR_FIELDS:
+            if field in self.emitted_fields or field not in parsed:
+                continue
+            if final or keys.index(field) < len(keys) - 1:
+                self.emitted_fields.add(field)
+                pieces.append((field, parsed[field]))
+
+        todos = parsed.get("todos")
+        if isinstance(todos, list):
+            todos_closed = final or keys.index("todos") < len(keys) - 1
+            complete = len(todos) if todos_closed else len(todos) - 1
+            while self.emitted_todos < complete:
+                pieces.append(("todo", todos[self.emitted_todos]))
+                self.emitted_todos += 1
+
+        return pieces
+
+    def feed(self, chunk: str) -> List[Tuple[str, object]]:
+        """
+        Adds a token chunk and returns the pieces that became complete
+        """
+        if not chunk:
+            return []
+        self.buffer += chunk
+        parsed = self._parse_buffer()
+        if parsed is None:
+            return []
+        return self._collect(parsed, final=False)
+
+    def finish(self) -> Tuple[List[Tuple[str, object]], Dict]:
+        """
+        Flushes the remaining pieces and returns them with the full document
+        """
+        parsed = self._parse_buffer() or {}
+        return self._collect(parsed, final=True), parsed
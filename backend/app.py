@@ -1,13 +1,22 @@
 from fastapi import FastAPI, Depends
 from fastapi.routing import APIRouter
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from pymongo.database import Database
-from database import get_database
+from database import get_database, readiness, warm_pool
+from metrics import registry
+from instrumentation import MetricsMiddleware, check_metrics_token
+import os
+import time
 from routers import todo, gamification, ai
-from db_setup import setup_database
+from migrations import run_migrations
+from services.gamification_events import start_workers, stop_workers
+from services.leaderboard import start_refresher, stop_refresher
 
 app = FastAPI(title="MobileSolutions API")
 
+STARTUP_SECONDS = registry.gauge("app_startup_seconds", "Duration of this worker's startup phases", ["phase"])
+
 # Configure CORS
 app.add_middleware(
     CORSMiddleware,
@@ -15,8 +24,12 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+# Per-route latency, status and in-flight requests
+app.add_middleware(MetricsMiddleware)
+
 api_router = APIRouter(prefix="/api/v1")
 
 @api_router.get("/")
@@ -25,13 +38,22 @@ def read_root():
 
 @api_router.get("/health")
 def health_check():
+    """Liveness: the process is serving requests, dependencies are not checked"""
     return {"status": "healthy"}
 
+@api_router.get("/ready")
+async def readiness_check():
+    """Readiness: MongoDB answers a ping (result cached for a few seconds)"""
+    ready, error = await readiness.check()
+    if not ready:
+        return JSONResponse(status_code=503, content={"status": "unavailable", "error": error})
+    return {"status": "ready"}
+
 @api_router.get("/db-test")
 async def db_test(db: Database = Depends(get_database)):
     try:
-        # Test MongoDB connection by retrieving server info
-        server_info = await db.command("serverStatus")
+        # Test MongoDB connection - buildInfo is cheap, unlike serverStatus
+        server_info = await db.command("buildInfo")
         return {
             "message": "Successfully connected to MongoDB",
             "version": server_info.get("version")
@@ -39,6 +61,16 @@ async def db_test(db: Database = Depends(get_database)):
     except Exception as e:
         return {"error": f"Failed to connect to MongoDB: {str(e)}"}
 
+@api_router.get("/internal/metrics", include_in_schema=False, dependencies=[Depends(check_metrics_token)])
+async def internal_metrics():
+    """Counters and histograms of this worker (requests, MongoDB commands, LLM calls, tokens, latencies)"""
+    return registry.snapshot()
+
+@api_router.get("/internal/metrics/prometheus", include_in_schema=False, dependencies=[Depends(check_metrics_token)])
+async def internal_metrics_prometheus():
+    """The same metrics in the Prometheus text format"""
+    return PlainTextResponse(registry.render_prometheus(), media_type="text/plain; version=0.0.4")
+
 # Include the todo router
 api_router.include_router(todo.router)
 
@@ -55,4 +87,40 @@ app.include_router(api_router)
 @app.on_event("startup")
 async def startup_event():
     """Initialize database on startup"""
-    await setup_database()
\ No newline at end of file
+    started = time.perf_counter()
+    db = await get_database()
+
+    # Open the pool's connections before the first requests arrive
+    await warm_pool()
+    pool_seconds = time.perf_counter() - started
+
+    # Schema, indexes and seed data - applied once by whichever worker gets the lock
+    report = await run_migrations(db)
+
+    # Background workers applying recorded gamification events
+    start_workers(db)
+
+    # Keeps the weekly leaderboard and the cached top-N snapshots fresh
+    start_refresher(db)
+
+    total_seconds = time.perf_counter() - started
+    STARTUP_SECONDS.set(pool_seconds, phase="pool")
+    STARTUP_SECONDS.set(report["seconds"], phase="migrations")
+    STARTUP_SECONDS.set(total_seconds, phase="total")
+    if report["locked"]:
+        migrations_status = f"left to another worker: {', '.join(report['pending'])}"
+    else:
+        migrations_status = f"applied: {', '.join(report['applied']) or 'none pending'}"
+        if report["failed"]:
+            migrations_status += f", failed: {', '.join(report['failed'])}"
+    print(
+        f"Startup finished in {total_seconds:.2f}s "
+        f"(pool {pool_seconds:.2f}s, migrations {report['seconds']:.2f}s, {migrations_status})"
+    )
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop background workers"""
+    await stop_workers()
+    await stop_refresher()
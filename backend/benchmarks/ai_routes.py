@@ -0,0 +1,115 @@
+"""
+Drives the /ai routes in-process against the offline fake LLM backend.
+
+    python -m benchmarks.ai_routes --concurrency 32 --requests 500 --latency 0.3 --tokens-per-second 80
+
+No network is used: the app runs behind httpx's ASGITransport, the model is
+ai.backends.FakeChatModel and the plan cache is disabled so every request
+reaches the model. Reports throughput and p50/p95/p99 per route; --json
+writes the same figures machine-readable.
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+
+
+ROUTES = {
+    "collect-start": ("POST", "/api/v1/ai/collect-start", {"message": "Hallo, ich möchte etwas Neues lernen"}),
+    "collect-continue": ("POST", "/api/v1/ai/collect-continue", {
+        "current_data": {"skill": "Python", "goal": None, "experience": None, "deadline": None},
+        "message": "Ich würde gerne Daten auswerten",
+    }),
+    "generate-skill": ("POST", "/api/v1/ai/generate-skill?force_regenerate=true", {
+        "status": "complete",
+        "current_data": {"skill": "React", "goal": "Portfolio bauen", "experience": "Anfänger", "deadline": "3 Monate"},
+        "missing_fields": [],
+        "next_question": None,
+    }),
+    "generate-skill/stream": ("POST", "/api/v1/ai/generate-skill/stream?force_regenerate=true", {
+        "status": "complete",
+        "current_data": {"skill": "Gitarre", "goal": "Lieder begleiten", "experience": "Anfänger", "deadline": "6 Wochen"},
+        "missing_fields": [],
+        "next_question": None,
+    }),
+}
+
+
+def percentile(samples, q):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))] if ordered else None
+
+
+async def run_route(client, method, path, body, concurrency, total):
+    latencies = []
+    errors = 0
+    remaining = total
+
+    async def worker():
+        nonlocal remaining, errors
+        while remaining > 0:
+            remaining -= 1
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            # Streaming responses are read to the end - the last event is what clients wait for
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            if response.status_code >= 400:
+                errors += 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Benchmark the AI routes against the fake LLM backend")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=500, help="Requests per route")
+    parser.add_argument("--latency", type=float, default=0.3, help="Fake model latency before the first token (s)")
+    parser.add_argument("--tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--routes", nargs="*", default=list(ROUTES), choices=list(ROUTES))
+    parser.add_argument("--json", help="Write the results to this file")
+    args = parser.parse_args()
+
+    # Configure before the app (and with it the AI modules) is imported
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_SECONDS"] = str(args.latency)
+    os.environ["LLM_FAKE_TOKENS_PER_SECOND"] = str(args.tokens_per_second)
+    os.environ["PLAN_CACHE_ENABLED"] = "0"
+
+    import httpx
+    from app import app
+
+    results = {}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as client:
+        for name in args.routes:
+            method, path, body = ROUTES[name]
+            results[name] = await run_route(client, method, path, body, args.concurrency, args.requests)
+            result = results[name]
+            print(
+                f"{name:<24} {result['throughput_rps']:8.1f} req/s  p50={result['p50_ms']:8.1f}ms "
+                f"p95={result['p95_ms']:8.1f}ms p99={result['p99_ms']:8.1f}ms  errors={result['errors']}"
+            )
+
+    if args.json:
+        config = {key: value for key, value in vars(args).items() if key != "json"}
+        with open(args.json, "w") as file:
+            json.dump({"config": config, "results": results}, file, indent=2)
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main()))
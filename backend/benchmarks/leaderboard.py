@@ -0,0 +1,110 @@
+"""
+Leaderboard benchmark against a real MongoDB.
+
+    MONGO_URI=mongodb://localhost:27017/leaderboard_bench python -m benchmarks.leaderboard --users 1000000
+
+Seeds user_stats (and one week of points_history) into the database given by
+MONGO_URI, reconciles the indexes and reports p50/p95/p99 latencies for top-N
+reads, rank lookups and the weekly refresh. Use a dedicated database - the
+seeded collections are dropped first.
+"""
+import argparse
+import asyncio
+import random
+import statistics
+import time
+from datetime import datetime, timedelta, timezone
+
+from db_indexes import reconcile_indexes
+from models.gamification import LeaderboardBoard
+from services import leaderboard
+
+SEED_BATCH = 10000
+
+
+def _percentiles(samples):
+    samples = sorted(samples)
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "mean": statistics.mean(samples) * 1000}
+
+
+async def seed(db, users: int, weekly_share: float):
+    await db.get_collection("user_stats").drop()
+    await db.get_collection("points_history").drop()
+    await db.get_collection(leaderboard.WEEKLY_COLLECTION).drop()
+
+    now = datetime.now(timezone.utc)
+    week_start = now - timedelta(days=now.weekday())
+    for start in range(0, users, SEED_BATCH):
+        stats = []
+        history = []
+        for index in range(start, min(start + SEED_BATCH, users)):
+            user_id = f"user_{index}"
+            # Long-tailed point distribution with plenty of ties, like real usage
+            stats.append({
+                "user_id": user_id,
+                "total_points": int(random.paretovariate(1.2) * 50),
+                "longest_streak": random.randint(0, 365),
+            })
+            if random.random() < weekly_share:
+                created_at = week_start + timedelta(seconds=random.randint(0, max(1, int((now - week_start).total_seconds()))))
+                history.append({
+                    "user_id": user_id,
+                    "points": random.choice([5, 10, 25, 50]),
+                    "reason": "todo_completed",
+                    "created_at": created_at.replace(tzinfo=None).isoformat(),
+                    "appended_at": created_at,
+                })
+        await db.get_collection("user_stats").insert_many(stats, ordered=False)
+        if history:
+            await db.get_collection("points_history").insert_many(history, ordered=False)
+
+
+async def measure(label, runs, action):
+    samples = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        await action()
+        samples.append(time.perf_counter() - started)
+    result = _percentiles(samples)
+    print(f"{label:<32} p50={result['p50']:8.2f}ms p95={result['p95']:8.2f}ms p99={result['p99']:8.2f}ms")
+    return result
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Benchmark leaderboard top-N and rank lookups")
+    parser.add_argument("--users", type=int, default=1_000_000)
+    parser.add_argument("--weekly-share", type=float, default=0.2, help="Share of users with points this week")
+    parser.add_argument("--runs", type=int, default=200)
+    parser.add_argument("--skip-seed", action="store_true")
+    args = parser.parse_args()
+
+    from database import client
+    db = client.get_database()
+
+    if not args.skip_seed:
+        started = time.perf_counter()
+        await seed(db, args.users, args.weekly_share)
+        print(f"Seeded {args.users} users in {time.perf_counter() - started:.1f}s")
+
+    started = time.perf_counter()
+    await reconcile_indexes(db, drop_undeclared=False)
+    print(f"Indexes ready in {time.perf_counter() - started:.1f}s")
+
+    await measure("weekly refresh", max(1, args.runs // 50), lambda: leaderboard.refresh_weekly(db))
+
+    for board in LeaderboardBoard:
+        period = leaderboard.current_week()[0] if board == LeaderboardBoard.WEEKLY else None
+        await measure(
+            f"{board.value} top-{leaderboard.LEADERBOARD_TOP_N} (uncached)", args.runs,
+            lambda: leaderboard._compute_top(db, board, period, leaderboard.LEADERBOARD_TOP_N)
+        )
+        await measure(f"{board.value} top-10 (cached)", args.runs, lambda: leaderboard.get_top(db, board, 10))
+        await measure(
+            f"{board.value} rank lookup", args.runs,
+            lambda: leaderboard.get_rank(db, board, f"user_{random.randrange(args.users)}")
+        )
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
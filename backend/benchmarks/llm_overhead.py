@@ -0,0 +1,132 @@
+"""
+Per-call overhead of the AI modules outside the model itself.
+
+    python -m benchmarks.llm_overhead --iterations 2000
+
+Compares rebuilding the chain on every call (prompt template, format
+instructions and model binding, as the modules used to do) with the chain
+registry, and the previous SkillItem validators (list lookup, re-import and
+regex compilation per call) with the frozen/precompiled ones. Runs against
+the fake backend with zero latency, so only local overhead is measured.
+"""
+import argparse
+import asyncio
+import importlib
+import os
+import time
+from typing import List
+
+from pydantic import BaseModel, Field, field_validator
+
+
+def _legacy_skill_item():
+    """SkillItem with the validators as they were before the lookup structures were precompiled"""
+    from ai.generator import TodoItem
+
+    class LegacySkillItem(BaseModel):
+        color: str = Field(...)
+        goal: str = Field(...)
+        icon: str = Field(...)
+        tip: str = Field(...)
+        title: str = Field(...)
+        todos: List[TodoItem] = Field(...)
+
+        @field_validator('icon')
+        def validate_lucide_icon(cls, v):
+            allowed_icons = [
+                "code", "book", "star", "target", "laptop", "brain", "chart-bar",
+                "graduation-cap", "heart", "zap", "trophy", "clock", "play",
+                "bookmark", "lightbulb", "settings", "terminal", "database",
+                "globe", "smartphone"
+            ]
+            if v not in allowed_icons:
+                raise ValueError(f"Icon must be one of: {', '.join(allowed_icons)}")
+            return v
+
+        @field_validator('color')
+        def validate_color_format(cls, v):
+            import re
+            if not re.match(r'^hsl\(\d+,\s*64%,\s*62%\)$', v):
+                raise ValueError("Color must be in format 'hsl(X, 64%, 62%)' where X is 0-360")
+            return v
+
+    return LegacySkillItem
+
+
+def _legacy_collector_chain():
+    """Chain construction as it happened on every call before the registry"""
+    from langchain_core.output_parsers import PydanticOutputParser
+    from langchain_core.prompts import PromptTemplate
+    from ai.backends import get_chat_model
+    from ai.collector import CollectorResponse
+    from ai.prompts import COLLECTOR_PROMPT
+
+    parser = PydanticOutputParser(pydantic_object=CollectorResponse)
+    prompt = PromptTemplate(
+        template=COLLECTOR_PROMPT + "\n{formation_template}",
+        input_variables=["skill", "goal", "experience", "deadline", "message"],
+        partial_variables={"formation_template": parser.get_format_instructions()},
+    )
+    # The model itself was created once at import, only prompt, parser and composition were per call
+    return prompt | get_chat_model().with_structured_output(
+        CollectorResponse, method="json_schema", include_raw=True
+    )
+
+
+def measure(label: str, iterations: int, action) -> float:
+    action()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        action()
+    per_call = (time.perf_counter() - started) / iterations * 1e6
+    print(f"{label:<44} {per_call:10.1f} µs/call")
+    return per_call
+
+
+async def ameasure(label: str, iterations: int, action) -> float:
+    await action()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await action()
+    per_call = (time.perf_counter() - started) / iterations * 1e6
+    print(f"{label:<44} {per_call:10.1f} µs/call")
+    return per_call
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of the per-call overhead around the LLM")
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_SECONDS"] = "0"
+    os.environ["LLM_FAKE_TOKENS_PER_SECOND"] = "1e12"
+
+    from ai.chains import get_chain
+    from ai.generator import SkillItem
+    # The collector registers its chain on import - load it before the registry lookups
+    importlib.import_module("ai.collector")
+
+    plan = {
+        "color": "hsl(210, 64%, 62%)", "goal": "Portfolio bauen", "icon": "code", "tip": "Jeden Tag üben",
+        "title": "React", "todos": [{"status": False, "text": f"Schritt {index}"} for index in range(6)],
+    }
+    inputs = {"skill": "", "goal": "", "experience": "", "deadline": "", "message": "Hallo"}
+    legacy_skill_item = _legacy_skill_item()
+
+    iterations = args.iterations
+    print("Chain construction")
+    measure("  rebuilt per call (before)", iterations, _legacy_collector_chain)
+    measure("  registry lookup (after)", iterations, lambda: get_chain("collector"))
+
+    print("SkillItem validation")
+    measure("  per-call lists and regex (before)", iterations * 5, lambda: legacy_skill_item.model_validate(plan))
+    measure("  frozen set, compiled regex (after)", iterations * 5, lambda: SkillItem.model_validate(plan))
+
+    print("Collector call incl. fake model")
+    await ameasure("  build + invoke (before)", iterations // 4, lambda: _legacy_collector_chain().ainvoke(inputs))
+    await ameasure("  registry + invoke (after)", iterations // 4, lambda: get_chain("collector").ainvoke(inputs))
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,275 @@
+"""
+Offline load test of the whole API, in-process.
+
+    python -m benchmarks.load_test --backend memory --users 2000 --requests 500 --concurrency 32
+    MONGO_URI=mongodb://localhost:27017/loadtest python -m benchmarks.load_test --backend mongod --json run.json
+    python -m benchmarks.load_test --backend mongod --compare run.json
+
+Boots app:app behind httpx's ASGITransport, seeds synthetic users, skills
+and points histories, then drives the todo, gamification and AI routes at
+a fixed concurrency and reports throughput and p50/p95/p99 per route. The
+AI routes run against the fake LLM backend.
+
+Backends:
+- memory: mongomock-motor, no server needed. It lacks pipeline updates,
+  arrayFilters, $unionWith and $merge, so routes relying on them are skipped.
+- mongod: the database in MONGO_URI (use a dedicated one - seeded
+  collections are dropped first). Runs the regular startup including
+  index reconciliation and the background workers.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import sys
+import time
+from datetime import datetime, timedelta, timezone
+
+from bson import ObjectId
+
+from benchmarks.ai_routes import percentile
+
+
+SEED_BATCH = 5000
+SEEDED_COLLECTIONS = ["skills", "user_stats", "points_history", "user_achievements", "gamification_events"]
+
+
+def configure(args):
+    """Environment and database wiring - must run before the app is imported."""
+    os.environ["LLM_BACKEND"] = "fake"
+    os.environ["LLM_FAKE_LATENCY_SECONDS"] = str(args.llm_latency)
+    os.environ["LLM_FAKE_TOKENS_PER_SECOND"] = str(args.llm_tokens_per_second)
+    os.environ["PLAN_CACHE_ENABLED"] = "0"
+
+    if args.backend == "memory":
+        from mongomock_motor import AsyncMongoMockClient
+        import database
+
+        database.client = AsyncMongoMockClient()
+        database.db = database.client.get_database("loadtest")
+
+        # mongomock knows neither transactions nor the hello command
+        from services import gamification_events
+        gamification_events._supports_transactions = False
+
+
+async def seed(db, args, rng: random.Random) -> dict:
+    """Insert synthetic data; returns the ids the scenarios pick from."""
+    for name in SEEDED_COLLECTIONS:
+        await db.get_collection(name).drop()
+
+    now = datetime.now(timezone.utc)
+    users = [f"load_user_{index}" for index in range(args.users)]
+    skills = []
+
+    for start in range(0, len(users), SEED_BATCH):
+        skill_documents, stats_documents, points_documents = [], [], []
+        for user_id in users[start:start + SEED_BATCH]:
+            for skill_index in range(args.skills_per_user):
+                skill_id = ObjectId()
+                items = [
+                    {"id": f"{skill_index}-{item}", "text": f"Schritt {item + 1}", "status": rng.random() < 0.3}
+                    for item in range(args.items_per_skill)
+                ]
+                skill_documents.append({
+                    "_id": skill_id, "title": f"Skill {skill_index}", "user": user_id, "icon": "code",
+                    "color": "hsl(200, 64%, 62%)", "textColor": "#000000", "tip": "Dranbleiben",
+                    "goal": "Ziel erreichen", "todos": items,
+                })
+                skills.append((str(skill_id), [item["id"] for item in items]))
+
+            total = 0
+            for seq in range(1, args.points_per_user + 1):
+                points = rng.choice([5, 10, 10, 25])
+                total += points
+                created_at = now - timedelta(minutes=rng.randint(0, 60 * 24 * 60))
+                points_documents.append({
+                    "user_id": user_id, "points": points, "reason": "todo_completed", "seq": seq,
+                    "metadata": {}, "created_at": created_at.replace(tzinfo=None).isoformat(),
+                    "appended_at": created_at,
+                })
+            stats_documents.append({
+                "user_id": user_id, "total_points": total, "ledger_seq": args.points_per_user,
+                "ledger_watermark": args.points_per_user, "current_level": 1, "current_level_progress": 0.0,
+                "streak_count": rng.randint(0, 20), "longest_streak": rng.randint(0, 60),
+                "last_active_date": now.isoformat(), "total_skills_completed": rng.randint(0, 5),
+                "total_todos_completed": rng.randint(0, 200), "unlocked_achievements": [],
+                "created_at": now.isoformat(), "updated_at": now.isoformat(),
+            })
+
+        if skill_documents:
+            await db.skills.insert_many(skill_documents, ordered=False)
+        await db.user_stats.insert_many(stats_documents, ordered=False)
+        if points_documents:
+            await db.points_history.insert_many(points_documents, ordered=False)
+
+    return {"users": users, "skills": skills}
+
+
+COLLECTOR_DONE = {
+    "status": "complete",
+    "current_data": {"skill": "React", "goal": "Portfolio bauen", "experience": "Anfänger", "deadline": "3 Monate"},
+    "missing_fields": [],
+    "next_question": None,
+}
+
+
+def _skill(context, rng):
+    return rng.choice(context["skills"])
+
+
+def _user(context, rng):
+    return rng.choice(context["users"])
+
+
+# name -> (method, build(context, rng) -> (path, json body), needs a real server)
+SCENARIOS = {
+    "GET /todos?user": ("GET", lambda c, r: (f"/api/v1/todos/?user={_user(c, r)}&limit=20", None), False),
+    "GET /todos?fields": ("GET", lambda c, r: (f"/api/v1/todos/?user={_user(c, r)}&fields=title,icon,color", None), False),
+    "GET /todos/{id}": ("GET", lambda c, r: (f"/api/v1/todos/{_skill(c, r)[0]}", None), False),
+    "PATCH /todos/{id}/items/{item}": ("PATCH", lambda c, r: (
+        lambda skill: (f"/api/v1/todos/{skill[0]}/items/{r.choice(skill[1])}", {"status": r.random() < 0.5})
+    )(_skill(c, r)), True),
+    "GET /gamification/stats": ("GET", lambda c, r: (f"/api/v1/gamification/stats/{_user(c, r)}", None), False),
+    "GET /gamification/achievements": ("GET", lambda c, r: (f"/api/v1/gamification/achievements/{_user(c, r)}", None), False),
+    "GET /gamification/summary": ("GET", lambda c, r: (f"/api/v1/gamification/summary/{_user(c, r)}", None), True),
+    "GET /gamification/levels": ("GET", lambda c, r: ("/api/v1/gamification/levels", None), False),
+    "GET /gamification/leaderboard": ("GET", lambda c, r: ("/api/v1/gamification/leaderboard/points?limit=10", None), False),
+    "GET /gamification/leaderboard/rank": ("GET", lambda c, r: (
+        f"/api/v1/gamification/leaderboard/points/rank/{_user(c, r)}", None
+    ), False),
+    "POST /ai/collect-start": ("POST", lambda c, r: ("/api/v1/ai/collect-start", {"message": "Hallo, ich möchte etwas lernen"}), False),
+    "POST /ai/generate-skill": ("POST", lambda c, r: ("/api/v1/ai/generate-skill?force_regenerate=true", COLLECTOR_DONE), False),
+}
+
+
+async def run_scenario(client, method, build, context, rng, concurrency, total):
+    latencies = []
+    statuses = {}
+    remaining = total
+
+    async def worker():
+        nonlocal remaining
+        while remaining > 0:
+            remaining -= 1
+            path, body = build(context, rng)
+            started = time.perf_counter()
+            response = await client.request(method, path, json=body)
+            await response.aread()
+            latencies.append(time.perf_counter() - started)
+            statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+
+    return {
+        "requests": len(latencies),
+        "errors": sum(count for code, count in statuses.items() if code >= 400),
+        "statuses": {str(code): count for code, count in sorted(statuses.items())},
+        "seconds": elapsed,
+        "throughput_rps": len(latencies) / elapsed if elapsed else 0.0,
+        "p50_ms": percentile(latencies, 0.50) * 1000,
+        "p95_ms": percentile(latencies, 0.95) * 1000,
+        "p99_ms": percentile(latencies, 0.99) * 1000,
+    }
+
+
+def print_comparison(results: dict, baseline_file: str):
+    with open(baseline_file) as file:
+        baseline = json.load(file)["results"]
+    print(f"\nCompared to {baseline_file}:")
+    for name, result in results.items():
+        before = baseline.get(name)
+        if not before or not before["p95_ms"] or not before["throughput_rps"]:
+            continue
+        p95_change = (result["p95_ms"] / before["p95_ms"] - 1) * 100
+        rps_change = (result["throughput_rps"] / before["throughput_rps"] - 1) * 100
+        print(f"{name:<36} p95 {p95_change:+7.1f}%   throughput {rps_change:+7.1f}%")
+
+
+async def _main(argv) -> int:
+    parser = argparse.ArgumentParser(description="Offline per-route load test of the API")
+    parser.add_argument("--backend", choices=["memory", "mongod"], default="memory")
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--skills-per-user", type=int, default=3)
+    parser.add_argument("--items-per-skill", type=int, default=8)
+    parser.add_argument("--points-per-user", type=int, default=20)
+    parser.add_argument("--requests", type=int, default=300, help="Requests per route")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="Fake model latency before the first token (s)")
+    parser.add_argument("--llm-tokens-per-second", type=float, default=80.0)
+    parser.add_argument("--routes", nargs="*", choices=list(SCENARIOS), default=list(SCENARIOS))
+    parser.add_argument("--seed", type=int, default=42, help="Random seed for data and request mix")
+    parser.add_argument("--json", help="Write the results to this file")
+    parser.add_argument("--compare", help="Results file of an earlier run to compare against")
+    args = parser.parse_args(argv)
+
+    configure(args)
+
+    import httpx
+    from app import app
+    from database import get_database
+    from routers.gamification import init_gamification_data
+    from services.catalog import catalog
+
+    db = await get_database()
+    rng = random.Random(args.seed)
+
+    started = time.perf_counter()
+    context = await seed(db, args, rng)
+    seed_seconds = time.perf_counter() - started
+    print(f"Seeded {args.users} users, {len(context['skills'])} skills in {seed_seconds:.1f}s ({args.backend})")
+
+    if args.backend == "mongod":
+        await app.router.startup()
+    else:
+        # Only seed and load the gamification catalog - the full startup needs
+        # server features (collMod, change streams, $merge)
+        await init_gamification_data(db)
+        await catalog.ensure_fresh(db)
+
+    results = {}
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://loadtest", timeout=None) as client:
+            for name in args.routes:
+                method, build, needs_server = SCENARIOS[name]
+                if needs_server and args.backend == "memory":
+                    print(f"{name:<36} skipped (needs mongod)")
+                    continue
+                results[name] = result = await run_scenario(
+                    client, method, build, context, rng, args.concurrency, args.requests
+                )
+                print(
+                    f"{name:<36} {result['throughput_rps']:8.1f} req/s  p50={result['p50_ms']:8.1f}ms "
+                    f"p95={result['p95_ms']:8.1f}ms p99={result['p99_ms']:8.1f}ms  errors={result['errors']}"
+                )
+    finally:
+        if args.backend == "mongod":
+            await app.router.shutdown()
+
+    if args.json:
+        report = {
+            "config": {key: value for key, value in vars(args).items() if key not in ("json", "compare")},
+            "environment": {
+                "python": platform.python_version(),
+                "platform": platform.platform(),
+                "started_at": datetime.now(timezone.utc).isoformat(),
+            },
+            "seed_seconds": seed_seconds,
+            "results": results,
+        }
+        with open(args.json, "w") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        print_comparison(results, args.compare)
+
+    return 1 if any(result["errors"] for result in results.values()) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -0,0 +1,101 @@
+"""
+Response serialization of the list endpoints.
+
+    python -m benchmarks.serialization --skills 100 --items 20 --achievements 200
+
+Compares FastAPI's regular path (response_model validation, jsonable
+encoding, stdlib json) with the trusted orjson path for a page of skills
+as returned by GET /todos and an achievement list as returned by
+GET /gamification/achievements/{user_id}. Only serialization is measured,
+no database or HTTP.
+"""
+import argparse
+import asyncio
+import time
+from typing import List
+
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_model_field
+
+from models.gamification import Achievement, AchievementWithProgress
+from models.todo import TodoListItem
+from responses import FastJSONResponse
+
+
+def skill_page(skills: int, items: int) -> List[dict]:
+    return [
+        {
+            "title": f"Skill {index}", "user": "benchmark_user", "icon": "code", "color": "hsl(200, 64%, 62%)",
+            "textColor": "#000000", "tip": "Jeden Tag ein wenig", "goal": "Ziel erreichen",
+            "todos": [{"id": str(item), "text": f"Schritt {item + 1}", "status": item % 3 == 0} for item in range(items)],
+            "id": str(ObjectId()),
+        }
+        for index in range(skills)
+    ]
+
+
+def achievement_list(achievements: int) -> List[dict]:
+    result = []
+    for index in range(achievements):
+        achievement = Achievement(
+            name=f"Achievement {index}", description="Erreiche ein Ziel", icon="trophy", category="general",
+            condition_type="todo_count", condition_value=index + 1, points_reward=10, id=str(ObjectId()),
+        ).model_dump(mode="json")
+        unlocked = index % 4 == 0
+        result.append({
+            **achievement, "is_unlocked": unlocked, "progress": 100.0 if unlocked else 42.0,
+            "unlocked_at": "2025-01-01T12:00:00" if unlocked else None,
+        })
+    return result
+
+
+async def ameasure(label: str, iterations: int, action) -> float:
+    await action()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        await action()
+    per_call = (time.perf_counter() - started) / iterations * 1e6
+    print(f"{label:<44} {per_call:10.1f} µs/call")
+    return per_call
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Micro-benchmark of response serialization")
+    parser.add_argument("--skills", type=int, default=100, help="Skills per page (MAX_PAGE_SIZE is 100)")
+    parser.add_argument("--items", type=int, default=20, help="Todo items per skill")
+    parser.add_argument("--achievements", type=int, default=200)
+    parser.add_argument("--iterations", type=int, default=200)
+    args = parser.parse_args()
+
+    skills = skill_page(args.skills, args.items)
+    achievements = achievement_list(args.achievements)
+    skills_field = create_model_field("response", List[TodoListItem], mode="serialization")
+    achievements_field = create_model_field("response", List[AchievementWithProgress], mode="serialization")
+
+    async def validated(field, content, exclude_unset=False):
+        serialized = await serialize_response(field=field, response_content=content, exclude_unset=exclude_unset)
+        return JSONResponse(serialized).body
+
+    async def trusted(content):
+        return FastJSONResponse(content).body
+
+    async def legacy_achievements():
+        # Before: a model per achievement, then jsonable_encoder (the route had no response_model)
+        models = [AchievementWithProgress(**achievement) for achievement in achievements]
+        return JSONResponse(await serialize_response(response_content=models)).body
+
+    iterations = args.iterations
+    print(f"GET /todos page ({args.skills} skills x {args.items} items)")
+    await ameasure("  response_model + json (before)", iterations, lambda: validated(skills_field, skills, True))
+    await ameasure("  trusted orjson (after)", iterations, lambda: trusted(skills))
+
+    print(f"GET /gamification/achievements ({args.achievements} achievements)")
+    await ameasure("  models + jsonable_encoder + json (before)", iterations, legacy_achievements)
+    await ameasure("  response_model + json (fast path off)", iterations, lambda: validated(achievements_field, achievements))
+    await ameasure("  trusted orjson (after)", iterations, lambda: trusted(achievements))
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
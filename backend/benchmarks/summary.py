@@ -0,0 +1,62 @@
+"""
+Round trips and latency of GET /gamification/summary against a real MongoDB.
+
+    MONGO_URI=mongodb://localhost:27017/skills python -m benchmarks.summary --user demo_user
+
+Counts the commands the summary sends to the server with a pymongo
+CommandListener and reports p50/p95/p99 over --runs calls.
+"""
+import argparse
+import asyncio
+import time
+from collections import Counter
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import monitoring
+
+from database import mongo_uri
+from routers.gamification import get_gamification_summary
+
+
+class CommandCounter(monitoring.CommandListener):
+    def __init__(self):
+        self.commands = Counter()
+
+    def started(self, event):
+        self.commands[event.command_name] += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Benchmark the gamification summary")
+    parser.add_argument("--user", default="demo_user")
+    parser.add_argument("--runs", type=int, default=200)
+    args = parser.parse_args()
+
+    counter = CommandCounter()
+    db = AsyncIOMotorClient(mongo_uri, event_listeners=[counter]).get_database()
+
+    # Warm up: creates the stats document and loads the catalog
+    await get_gamification_summary(args.user, db)
+
+    counter.commands.clear()
+    samples = []
+    for _ in range(args.runs):
+        started = time.perf_counter()
+        await get_gamification_summary(args.user, db)
+        samples.append(time.perf_counter() - started)
+
+    samples.sort()
+    pick = lambda q: samples[min(len(samples) - 1, int(q * len(samples)))] * 1000
+    round_trips = sum(counter.commands.values()) / args.runs
+    print(f"round trips per summary: {round_trips:.2f} ({dict(counter.commands)})")
+    print(f"latency p50={pick(0.50):.2f}ms p95={pick(0.95):.2f}ms p99={pick(0.99):.2f}ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -1,12 +1,99 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from pymongo.database import Database
+import asyncio
 import os
+import time
+
+from instrumentation import CommandMetricsListener, PoolMetricsListener
 
 # MongoDB connection
 mongo_uri = os.getenv("MONGO_URI", "mongodb://localhost:27017/skills")
-client = AsyncIOMotorClient(mongo_uri)
+
+# Connection pool and client options - they take precedence over options in MONGO_URI
+MONGO_MIN_POOL_SIZE = int(os.getenv("MONGO_MIN_POOL_SIZE", "5"))
+MONGO_MAX_POOL_SIZE = int(os.getenv("MONGO_MAX_POOL_SIZE", "100"))
+MONGO_WAIT_QUEUE_TIMEOUT_MS = int(os.getenv("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000"))
+MONGO_SERVER_SELECTION_TIMEOUT_MS = int(os.getenv("MONGO_SERVER_SELECTION_TIMEOUT_MS", "5000"))
+# Comma separated in order of preference, e.g. "zstd,snappy,zlib" - empty disables wire compression
+MONGO_COMPRESSORS = os.getenv("MONGO_COMPRESSORS", "")
+MONGO_APPNAME = os.getenv("MONGO_APPNAME", "mobilesolutions-api")
+
+# Readiness: how long a ping result is reused, and how long a ping may take
+READINESS_CACHE_SECONDS = float(os.getenv("READINESS_CACHE_SECONDS", "2"))
+READINESS_TIMEOUT_SECONDS = float(os.getenv("READINESS_TIMEOUT_SECONDS", "1"))
+
+
+def client_options() -> dict:
+    options = {
+        "minPoolSize": MONGO_MIN_POOL_SIZE,
+        "maxPoolSize": MONGO_MAX_POOL_SIZE,
+        "waitQueueTimeoutMS": MONGO_WAIT_QUEUE_TIMEOUT_MS or None,
+        "serverSelectionTimeoutMS": MONGO_SERVER_SELECTION_TIMEOUT_MS,
+        "appname": MONGO_APPNAME,
+        # Listeners feed the command latency and pool metrics (see /api/v1/internal/metrics)
+        "event_listeners": [CommandMetricsListener(), PoolMetricsListener()],
+    }
+    if MONGO_COMPRESSORS:
+        options["compressors"] = MONGO_COMPRESSORS
+    return options
+
+
+client = AsyncIOMotorClient(mongo_uri, **client_options())
 db = client.get_database()
 
 # Database getter
 async def get_database() -> Database:
     return db
+
+
+async def warm_pool():
+    """
+    Open MONGO_MIN_POOL_SIZE connections before the first request, instead of
+    paying for connection setup (TCP, TLS, handshake, auth) on the first
+    requests after a start.
+    """
+    started = time.perf_counter()
+    try:
+        # Concurrent pings each need their own connection
+        await asyncio.gather(*(db.command("ping") for _ in range(max(MONGO_MIN_POOL_SIZE, 1))))
+        print(f"MongoDB pool warmed with {MONGO_MIN_POOL_SIZE} connections in {time.perf_counter() - started:.2f}s")
+    except Exception as e:
+        print(f"Error warming MongoDB connection pool: {e}")
+
+
+class ReadinessCheck:
+    """
+    Cached ping for readiness probes. Results are reused for
+    READINESS_CACHE_SECONDS and concurrent probes share one ping, so frequent
+    load balancer checks cost at most one cheap command per interval.
+    """
+
+    def __init__(self, cache_seconds: float, timeout_seconds: float):
+        self.cache_seconds = cache_seconds
+        self.timeout_seconds = timeout_seconds
+        self._checked_at = float("-inf")
+        self._result = (False, "not checked yet")
+        self._lock = asyncio.Lock()
+
+    async def _ping(self):
+        try:
+            await asyncio.wait_for(db.command("ping"), self.timeout_seconds)
+            return True, None
+        except asyncio.TimeoutError:
+            return False, f"ping timed out after {self.timeout_seconds}s"
+        except Exception as e:
+            return False, str(e)
+
+    async def check(self):
+        """Returns (ready, error)"""
+        if time.monotonic() - self._checked_at < self.cache_seconds:
+            return self._result
+        async with self._lock:
+            # Another probe may have pinged while this one waited for the lock
+            if time.monotonic() - self._checked_at >= self.cache_seconds:
+                self._result = await self._ping()
+                self._checked_at = time.monotonic()
+        return self._result
+
+
+readiness = ReadinessCheck(READINESS_CACHE_SECONDS, READINESS_TIMEOUT_SECONDS)
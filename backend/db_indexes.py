@@ -0,0 +1,205 @@
+import asyncio
+import sys
+from typing import Dict, List, Optional
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+from ai.plan_cache import PLAN_CACHE_COLLECTION, PLAN_CACHE_TTL_SECONDS
+from ai.sessions import COLLECTOR_SESSIONS_COLLECTION, COLLECTOR_SESSION_TTL_SECONDS
+from services.gamification_events import DUE_EVENTS_SORT, EVENTS_COLLECTION, EVENTS_RETENTION_SECONDS, due_events_filter
+from services.leaderboard import WEEKLY_COLLECTION, WEEKLY_RETENTION_SECONDS
+
+
+# Every index the routers rely on. reconcile_indexes() creates and rebuilds
+# indexes towards this registry at startup and only reports undeclared ones;
+# `python db_indexes.py --prune` also drops those, `--check` additionally
+# explains each router query shape and fails on any collection scan.
+INDEX_REGISTRY: Dict[str, List[IndexModel]] = {
+    "skills": [
+        IndexModel([("title", ASCENDING)], name="title_1"),
+        IndexModel([("user", ASCENDING), ("_id", ASCENDING)], name="user_1__id_1"),
+    ],
+    "user_stats": [
+        IndexModel([("user_id", ASCENDING)], name="user_id_1", unique=True),
+        # Leaderboards: top-N walks these in order, rank lookups count over them
+        IndexModel([("total_points", DESCENDING)], name="total_points_-1"),
+        IndexModel([("longest_streak", DESCENDING)], name="longest_streak_-1"),
+    ],
+    "user_achievements": [
+        IndexModel(
+            [("user_id", ASCENDING), ("achievement_id", ASCENDING)],
+            name="user_id_1_achievement_id_1",
+            unique=True,
+        ),
+        IndexModel([("user_id", ASCENDING), ("unlocked_at", DESCENDING)], name="user_id_1_unlocked_at_-1"),
+    ],
+    "points_history": [
+        IndexModel([("user_id", ASCENDING), ("created_at", DESCENDING)], name="user_id_1_created_at_-1"),
+        IndexModel(
+            [("user_id", ASCENDING), ("seq", ASCENDING)],
+            name="user_id_1_seq_1",
+            unique=True,
+            partialFilterExpression={"seq": {"$exists": True}},
+        ),
+        IndexModel(
+            [("idempotency_key", ASCENDING)],
+            name="idempotency_key_1",
+            unique=True,
+            partialFilterExpression={"idempotency_key": {"$exists": True}},
+        ),
+        IndexModel([("appended_at", ASCENDING)], name="appended_at_1"),
+    ],
+    WEEKLY_COLLECTION: [
+        IndexModel([("week", ASCENDING), ("points", DESCENDING)], name="week_1_points_-1"),
+        IndexModel([("week", ASCENDING), ("user_id", ASCENDING)], name="week_1_user_id_1"),
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_1", expireAfterSeconds=WEEKLY_RETENTION_SECONDS),
+    ],
+    EVENTS_COLLECTION: [
+        IndexModel([("status", ASCENDING), ("available_at", ASCENDING)], name="status_1_available_at_1"),
+        IndexModel([("status", ASCENDING), ("locked_until", ASCENDING)], name="status_1_locked_until_1"),
+        IndexModel([("processed_at", ASCENDING)], name="processed_at_1", expireAfterSeconds=EVENTS_RETENTION_SECONDS),
+    ],
+    "levels": [
+        IndexModel([("level", ASCENDING)], name="level_1"),
+    ],
+    PLAN_CACHE_COLLECTION: [
+        IndexModel([("created_at", ASCENDING)], name="created_at_1", expireAfterSeconds=PLAN_CACHE_TTL_SECONDS),
+    ],
+    COLLECTOR_SESSIONS_COLLECTION: [
+        IndexModel([("updated_at", ASCENDING)], name="updated_at_1", expireAfterSeconds=COLLECTOR_SESSION_TTL_SECONDS),
+    ],
+}
+
+
+# Query shapes issued by the routers: (name, collection, filter, sort)
+QUERY_SHAPES = [
+    ("user stats by user", "user_stats", {"user_id": "u"}, None),
+    ("unlocked achievements by user", "user_achievements", {"user_id": "u"}, None),
+    ("unlocked achievement by user and id", "user_achievements", {"user_id": "u", "achievement_id": "a"}, None),
+    ("recent achievements", "user_achievements", {"user_id": "u"}, [("unlocked_at", DESCENDING)]),
+    ("recent points", "points_history", {"user_id": "u"}, [("created_at", DESCENDING)]),
+    ("ledger entries after watermark", "points_history", {"user_id": "u", "seq": {"$gt": 0}}, [("seq", ASCENDING)]),
+    ("skills page by user", "skills", {"user": "u"}, [("_id", ASCENDING)]),
+    ("levels in order", "levels", {}, [("level", ASCENDING)]),
+    ("points leaderboard", "user_stats", {}, [("total_points", DESCENDING)]),
+    ("points rank", "user_stats", {"total_points": {"$gt": 0}}, None),
+    ("streak leaderboard", "user_stats", {}, [("longest_streak", DESCENDING)]),
+    ("streak rank", "user_stats", {"longest_streak": {"$gt": 0}}, None),
+    ("points of the week", "points_history", {"appended_at": {"$gte": 0}}, None),
+    ("weekly leaderboard", WEEKLY_COLLECTION, {"week": "w"}, [("points", DESCENDING)]),
+    ("weekly rank", WEEKLY_COLLECTION, {"week": "w", "points": {"$gt": 0}}, None),
+    ("weekly entry by user", WEEKLY_COLLECTION, {"week": "w", "user_id": "u"}, None),
+    # Both $or branches - due pending events and expired leases - must be index-backed
+    ("due gamification events", EVENTS_COLLECTION, due_events_filter(0), DUE_EVENTS_SORT),
+]
+
+# Options that are compared when deciding whether an existing index matches its spec
+_COMPARED_OPTIONS = ("unique", "sparse", "expireAfterSeconds", "partialFilterExpression")
+
+
+def _index_differs(existing: dict, spec: dict) -> bool:
+    if list(existing["key"]) != list(spec["key"].items()):
+        return True
+    return any(existing.get(option) != spec.get(option) for option in _COMPARED_OPTIONS)
+
+
+async def reconcile_indexes(db, drop_undeclared: bool = False) -> Dict[str, List[str]]:
+    """
+    Create missing indexes and rebuild ones whose definition changed.
+    Indexes on registered collections that are no longer declared are
+    reported as undeclared, and only dropped with drop_undeclared.
+    """
+    report = {"created": [], "rebuilt": [], "undeclared": [], "dropped": [], "failed": []}
+
+    for collection_name, models in INDEX_REGISTRY.items():
+        collection = db.get_collection(collection_name)
+        existing = await collection.index_information()
+        declared = set()
+
+        for model in models:
+            spec = model.document
+            name = spec["name"]
+            declared.add(name)
+            qualified = f"{collection_name}.{name}"
+
+            try:
+                if name in existing and not _index_differs(existing[name], spec):
+                    continue
+                if name in existing:
+                    await collection.drop_index(name)
+                    report["rebuilt"].append(qualified)
+                else:
+                    report["created"].append(qualified)
+                await collection.create_indexes([model])
+            except OperationFailure as e:
+                # e.g. duplicates preventing a unique index - keep serving, check mode will flag it
+                print(f"Error creating index {qualified}: {e}")
+                report["failed"].append(qualified)
+
+        for name in existing:
+            if name == "_id_" or name in declared:
+                continue
+            if drop_undeclared:
+                await collection.drop_index(name)
+                report["dropped"].append(f"{collection_name}.{name}")
+            else:
+                # Maybe created by hand or by a newer deployment - leave it to an explicit --prune
+                report["undeclared"].append(f"{collection_name}.{name}")
+
+    return report
+
+
+def _find_collscan(plan) -> bool:
+    if isinstance(plan, dict):
+        if plan.get("stage") == "COLLSCAN":
+            return True
+        return any(_find_collscan(value) for value in plan.values())
+    if isinstance(plan, list):
+        return any(_find_collscan(value) for value in plan)
+    return False
+
+
+async def explain_query_shape(db, collection_name: str, query: dict, sort: Optional[list]) -> dict:
+    find = {"find": collection_name, "filter": query}
+    if sort:
+        find["sort"] = dict(sort)
+    result = await db.command({"explain": find, "verbosity": "queryPlanner"})
+    return result["queryPlanner"]["winningPlan"]
+
+
+async def check_query_plans(db) -> List[str]:
+    """
+    Returns the names of all query shapes whose winning plan is a COLLSCAN
+    """
+    failures = []
+    for name, collection_name, query, sort in QUERY_SHAPES:
+        winning_plan = await explain_query_shape(db, collection_name, query, sort)
+        if _find_collscan(winning_plan):
+            failures.append(f"{name} ({collection_name})")
+    return failures
+
+
+async def _main(argv: List[str]) -> int:
+    from database import client
+
+    db = client.get_database()
+    report = await reconcile_indexes(db, drop_undeclared="--prune" in argv)
+    for action, names in report.items():
+        for name in names:
+            print(f"{action}: {name}")
+
+    if "--check" not in argv:
+        return 1 if report["failed"] else 0
+
+    failures = await check_query_plans(db)
+    for failure in failures:
+        print(f"COLLSCAN: {failure}")
+    if failures or report["failed"]:
+        return 1
+    print(f"All {len(QUERY_SHAPES)} query shapes are index-backed")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
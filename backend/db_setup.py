@@ -1,16 +1,15 @@
 from database import client
 from models.todo import todo_schema
+from db_indexes import reconcile_indexes
 
 
-async def setup_database():
+async def apply_todo_schema(db):
     """
-    Setup database collections with validation schemas
+    Create the todos collection with its validation schema, or update the schema
     """
-    db = client.get_database()
-    
     # Check if todos collection exists
     collection_names = await db.list_collection_names()
-    
+
     if "todos" not in collection_names:
         # Create todos collection with validation schema
         await db.create_collection("todos", validator=todo_schema)
@@ -22,6 +21,24 @@ async def setup_database():
             "validator": todo_schema
         })
         print("Updated todos collection validation schema")
-        
-    # Create indexes if needed
-    await db.skills.create_index("title")
+
+
+async def apply_indexes(db) -> dict:
+    """
+    Bring indexes in line with the registry
+    """
+    report = await reconcile_indexes(db)
+    for action, names in report.items():
+        if names:
+            print(f"Indexes {action}: {', '.join(names)}")
+    return report
+
+
+async def setup_database():
+    """
+    Setup database collections with validation schemas and indexes.
+    The app runs these steps once per version through migrations.run_migrations.
+    """
+    db = client.get_database()
+    await apply_todo_schema(db)
+    await apply_indexes(db)
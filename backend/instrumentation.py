@@ -0,0 +1,170 @@
+import hmac
+import os
+import time
+from typing import Dict, Tuple
+
+from fastapi import Header, HTTPException
+from pymongo import monitoring
+
+from metrics import registry
+
+
+# Finer than the default buckets - most API requests and database commands finish within milliseconds
+REQUEST_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+COMMAND_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+HTTP_REQUESTS = registry.counter("http_requests_total", "HTTP requests by route and status", ["method", "route", "status"])
+HTTP_LATENCY = registry.histogram(
+    "http_request_duration_seconds", "Duration of HTTP requests", ["method", "route"], REQUEST_BUCKETS
+)
+HTTP_IN_FLIGHT = registry.gauge("http_requests_in_flight", "HTTP requests currently being handled", ["method"])
+
+MONGO_COMMANDS = registry.counter(
+    "mongodb_commands_total", "MongoDB commands by collection and outcome (ok, error, timeout)",
+    ["collection", "command", "outcome"]
+)
+MONGO_LATENCY = registry.histogram(
+    "mongodb_command_duration_seconds", "Duration of MongoDB commands", ["collection", "command"], COMMAND_BUCKETS
+)
+MONGO_CHECKED_OUT = registry.gauge("mongodb_pool_checked_out_connections", "Connections currently in use")
+MONGO_CHECKOUT_FAILURES = registry.counter(
+    "mongodb_pool_checkout_failures_total", "Failed connection checkouts by reason (timeout, connectionError, poolClosed)",
+    ["reason"]
+)
+
+# Requests matching no route share one label, so scanners cannot blow up the number of series
+UNMATCHED_ROUTE = "unmatched"
+
+# Server error codes meaning a time limit was hit (MaxTimeMSExpired, WriteConcernFailed/wtimeout, ExceededTimeLimit)
+TIMEOUT_CODES = {50, 64, 262}
+TIMEOUT_ERROR_TYPES = {"NetworkTimeout", "ExecutionTimeout", "WTimeoutError"}
+
+
+# Shared secret for the internal endpoints (app.py, routers/ai.py) - without it they are not served at all
+METRICS_TOKEN = os.getenv("METRICS_TOKEN")
+
+
+def check_metrics_token(x_metrics_token: str = Header(None), authorization: str = Header(None)):
+    """Accepts the token as X-Metrics-Token or as bearer token (Prometheus authorization config)"""
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    candidates = (x_metrics_token or "", (authorization or "").removeprefix("Bearer "))
+    if not any(hmac.compare_digest(METRICS_TOKEN, candidate) for candidate in candidates):
+        raise HTTPException(status_code=403, detail="Forbidden")
+
+
+def route_template(scope) -> str:
+    """The path template of the route that handled the request, e.g. /api/v1/todos/{todo_id}"""
+    # The router stores the matched route in the scope - also for 405 responses
+    route = scope.get("route")
+    return getattr(route, "path", UNMATCHED_ROUTE)
+
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware recording latency and status per route and the
+    requests in flight. Routes are labelled with their path template, never
+    with the raw path, to keep the number of series bounded. The route is
+    only known once the router has matched it, so the in-flight gauge is
+    per method - matching every request a second time up front costs more
+    than the rest of the middleware.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_wrapper(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        HTTP_IN_FLIGHT.inc(method=method)
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            route = route_template(scope)
+            HTTP_LATENCY.observe(time.perf_counter() - started, method=method, route=route)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status_code)
+            HTTP_IN_FLIGHT.dec(method=method)
+
+
+def _command_collection(event: monitoring.CommandStartedEvent) -> str:
+    # find/insert/update/aggregate/... name the collection in their first field, getMore in "collection"
+    target = event.command.get("collection") if event.command_name == "getMore" else event.command.get(event.command_name)
+    return target if isinstance(target, str) else ""
+
+
+def _is_timeout(failure: Dict) -> bool:
+    return failure.get("code") in TIMEOUT_CODES or failure.get("errtype") in TIMEOUT_ERROR_TYPES
+
+
+class CommandMetricsListener(monitoring.CommandListener):
+    """
+    Times every MongoDB command by collection and command name and counts
+    errors and timeouts. The collection is only part of the started event,
+    so it is kept until the command finishes.
+    """
+
+    def __init__(self):
+        self._pending: Dict[Tuple, str] = {}
+
+    def started(self, event: monitoring.CommandStartedEvent):
+        self._pending[(event.connection_id, event.request_id)] = _command_collection(event)
+
+    def _finish(self, event, outcome: str):
+        collection = self._pending.pop((event.connection_id, event.request_id), "")
+        MONGO_LATENCY.observe(event.duration_micros / 1_000_000, collection=collection, command=event.command_name)
+        MONGO_COMMANDS.inc(collection=collection, command=event.command_name, outcome=outcome)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent):
+        self._finish(event, "ok")
+
+    def failed(self, event: monitoring.CommandFailedEvent):
+        self._finish(event, "timeout" if _is_timeout(event.failure) else "error")
+
+
+class PoolMetricsListener(monitoring.ConnectionPoolListener):
+    """Connections in use and failed checkouts (e.g. waitQueueTimeoutMS exceeded)."""
+
+    def connection_checked_out(self, event):
+        MONGO_CHECKED_OUT.inc()
+
+    def connection_checked_in(self, event):
+        MONGO_CHECKED_OUT.dec()
+
+    def connection_check_out_failed(self, event):
+        MONGO_CHECKOUT_FAILURES.inc(reason=event.reason)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
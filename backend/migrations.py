@@ -0,0 +1,217 @@
+"""
+One-time database bootstrap shared by all workers.
+
+    python migrations.py            # apply pending steps
+    python migrations.py --status   # show what is applied
+
+Every step has a version - a fingerprint of what it applies (validation
+schema, index registry, default catalog) - and is recorded in the
+migrations collection once it succeeded. At startup a worker first reads
+these records; when everything is applied it goes straight to serving.
+Otherwise it tries to take a lease lock in migration_locks: the holder
+applies the pending steps, renewing the lease while it works, and the other
+workers do not wait for it. A lock left behind by a crashed worker expires
+after MIGRATION_LOCK_LEASE_SECONDS.
+"""
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Awaitable, Callable, Dict, List, NamedTuple, Optional
+
+from pymongo.database import Database
+from pymongo.errors import DuplicateKeyError
+
+from db_indexes import INDEX_REGISTRY
+from db_setup import apply_indexes, apply_todo_schema
+from models.todo import todo_schema
+from routers.gamification import DEFAULT_ACHIEVEMENTS, DEFAULT_LEVELS, init_gamification_data
+from services.ledger import backfill_appended_at
+
+
+MIGRATION_LOCK_LEASE_SECONDS = float(os.getenv("MIGRATION_LOCK_LEASE_SECONDS", "60"))
+
+MIGRATIONS_COLLECTION = "migrations"
+MIGRATION_LOCKS_COLLECTION = "migration_locks"
+STARTUP_LOCK_ID = "startup"
+
+
+def fingerprint(*parts) -> str:
+    """Stable short hash of JSON-like data, ignoring Mongo-assigned _ids"""
+    def strip_ids(value):
+        if isinstance(value, dict):
+            return {key: strip_ids(item) for key, item in value.items() if key != "_id"}
+        if isinstance(value, (list, tuple)):
+            return [strip_ids(item) for item in value]
+        return value
+
+    encoded = json.dumps(strip_ids(list(parts)), sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+class Migration(NamedTuple):
+    name: str
+    version: Callable[[], str]
+    apply: Callable[[Database], Awaitable[Optional[dict]]]
+
+
+def _todo_schema_version() -> str:
+    return fingerprint(todo_schema)
+
+
+def _indexes_version() -> str:
+    return fingerprint({name: [model.document for model in models] for name, models in INDEX_REGISTRY.items()})
+
+
+async def _apply_indexes(db: Database) -> dict:
+    report = await apply_indexes(db)
+    if report["failed"]:
+        # Not recorded - the next start tries again
+        raise RuntimeError(f"Indexes failed: {', '.join(report['failed'])}")
+    return report
+
+
+def _gamification_seed_version() -> str:
+    # init_gamification_data upserts every default, so a changed default is applied on the next start
+    return fingerprint(DEFAULT_LEVELS, DEFAULT_ACHIEVEMENTS)
+
+
+# Applied in this order; a failing step stops the run and is retried on the next start
+MIGRATIONS: List[Migration] = [
+    Migration("todo_schema", _todo_schema_version, apply_todo_schema),
+    Migration("indexes", _indexes_version, _apply_indexes),
+    Migration("gamification_seed", _gamification_seed_version, init_gamification_data),
+    # Only new entries get appended_at from the ledger itself
+    Migration("ledger_appended_at", lambda: "1", backfill_appended_at),
+]
+
+
+def _owner_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+
+
+async def pending_migrations(db: Database) -> List[Migration]:
+    """Steps whose recorded version differs from the current one (one query)."""
+    names = [migration.name for migration in MIGRATIONS]
+    records = await db.get_collection(MIGRATIONS_COLLECTION).find({"_id": {"$in": names}}).to_list(None)
+    applied = {record["_id"]: record.get("version") for record in records}
+    return [migration for migration in MIGRATIONS if applied.get(migration.name) != migration.version()]
+
+
+async def acquire_lock(db: Database, owner: str, lease_seconds: float = MIGRATION_LOCK_LEASE_SECONDS) -> bool:
+    """Take (or extend) the lease - fails while another owner holds an unexpired one."""
+    now = datetime.now(timezone.utc)
+    try:
+        await db.get_collection(MIGRATION_LOCKS_COLLECTION).find_one_and_update(
+            {"_id": STARTUP_LOCK_ID, "$or": [{"expires_at": {"$lte": now}}, {"owner": owner}]},
+            {"$set": {"owner": owner, "expires_at": now + timedelta(seconds=lease_seconds), "acquired_at": now}},
+            upsert=True
+        )
+        return True
+    except DuplicateKeyError:
+        # The lock document exists and belongs to someone else - the upsert collided with it
+        return False
+
+
+async def release_lock(db: Database, owner: str):
+    await db.get_collection(MIGRATION_LOCKS_COLLECTION).delete_one({"_id": STARTUP_LOCK_ID, "owner": owner})
+
+
+async def _renew_lock(db: Database, owner: str, lease_seconds: float):
+    """Extend the lease while long steps (index builds) run."""
+    while True:
+        await asyncio.sleep(lease_seconds / 3)
+        try:
+            if not await acquire_lock(db, owner, lease_seconds):
+                print("Migration lock was taken over by another worker")
+                return
+        except Exception as e:
+            print(f"Error renewing migration lock: {e}")
+
+
+async def run_migrations(db: Database, lease_seconds: float = MIGRATION_LOCK_LEASE_SECONDS) -> Dict:
+    """
+    Apply pending steps if this worker gets the lock. Returns a report with
+    the applied and failed steps, the steps left to another worker and the
+    duration.
+    """
+    started = time.perf_counter()
+    report = {"applied": [], "pending": [], "failed": [], "locked": False, "seconds": 0.0}
+
+    pending = await pending_migrations(db)
+    if pending:
+        owner = _owner_id()
+        if not await acquire_lock(db, owner, lease_seconds):
+            # Another worker is bootstrapping - serve right away, it signals catalog changes itself
+            report["pending"] = [migration.name for migration in pending]
+            report["locked"] = True
+        else:
+            renewer = asyncio.create_task(_renew_lock(db, owner, lease_seconds))
+            try:
+                # Re-read under the lock, the previous holder may just have finished
+                for migration in await pending_migrations(db):
+                    step_started = time.perf_counter()
+                    version = migration.version()
+                    try:
+                        result = await migration.apply(db)
+                    except Exception as e:
+                        # Keep serving; later steps may depend on this one, so stop here
+                        print(f"Error applying migration {migration.name}: {e}")
+                        report["failed"].append(migration.name)
+                        break
+                    duration = time.perf_counter() - step_started
+                    await db.get_collection(MIGRATIONS_COLLECTION).replace_one(
+                        {"_id": migration.name},
+                        {
+                            "_id": migration.name,
+                            "version": version,
+                            "applied_at": datetime.now(timezone.utc),
+                            "applied_by": owner,
+                            "duration_seconds": duration,
+                            "result": result,
+                        },
+                        upsert=True
+                    )
+                    report["applied"].append(migration.name)
+            finally:
+                renewer.cancel()
+                await release_lock(db, owner)
+
+    report["seconds"] = time.perf_counter() - started
+    return report
+
+
+async def _main(argv: List[str]) -> int:
+    from database import client
+
+    db = client.get_database()
+    if "--status" in argv:
+        pending = {migration.name for migration in await pending_migrations(db)}
+        records = {
+            record["_id"]: record
+            for record in await db.get_collection(MIGRATIONS_COLLECTION).find().to_list(None)
+        }
+        for migration in MIGRATIONS:
+            record = records.get(migration.name, {})
+            state = "pending" if migration.name in pending else "applied"
+            print(f"{migration.name:<20} {state:<8} {migration.version()} {record.get('applied_at', '')}")
+        return 1 if pending else 0
+
+    report = await run_migrations(db)
+    if report["locked"]:
+        print(f"Another worker holds the migration lock, pending: {', '.join(report['pending'])}")
+        return 1
+    print(f"Applied: {', '.join(report['applied']) or 'nothing'} ({report['seconds']:.2f}s)")
+    if report["failed"]:
+        print(f"Failed: {', '.join(report['failed'])}")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(_main(sys.argv[1:])))
@@ -26,6 +26,7 @@ class PointsReason(str, Enum):
     STREAK_BONUS = "streak_bonus"
     ACHIEVEMENT_UNLOCKED = "achievement_unlocked"
     DAILY_LOGIN = "daily_login"
+    ADJUSTMENT = "adjustment"
 
 
 class UserStats(BaseModel):
@@ -41,6 +42,7 @@ class UserStats(BaseModel):
     last_active_date: str = Field(default_factory=lambda: datetime.now().isoformat(), description="Last activity date")
     total_skills_completed: int = Field(default=0, description="Total skills completed")
     total_todos_completed: int = Field(default=0, description="Total todos completed")
+    unlocked_achievements: List[str] = Field(default_factory=list, description="IDs of unlocked achievements")
     created_at: str = Field(default_factory=lambda: datetime.now().isoformat(), description="Creation timestamp")
     updated_at: str = Field(default_factory=lambda: datetime.now().isoformat(), description="Last update timestamp")
     
@@ -174,7 +176,7 @@ class UserStatsUpdate(BaseModel):
     """
     Model for updating user stats.
     """
-    points_to_add: Optional[int] = Field(None, description="Points to add")
+    points_to_add: Optional[int] = Field(None, description="Points to add (recorded as a ledger adjustment)")
     todos_completed: Optional[int] = Field(None, description="Number of todos completed")
     skills_completed: Optional[int] = Field(None, description="Number of skills completed")
     update_streak: Optional[bool] = Field(None, description="Whether to update streak")
@@ -202,3 +204,37 @@ class GamificationSummary(BaseModel):
     recent_achievements: List[UserAchievement] = Field(..., description="Recently unlocked achievements")
     next_achievements: List[AchievementWithProgress] = Field(..., description="Achievements close to unlocking")
     recent_points: List[PointsEntry] = Field(..., description="Recent points activity")
+
+
+class LeaderboardBoard(str, Enum):
+    POINTS = "points"
+    STREAK = "streak"
+    WEEKLY = "weekly"
+
+
+class LeaderboardEntry(BaseModel):
+    """Single leaderboard row."""
+    rank: int = Field(..., description="Rank (equal values share a rank)")
+    user_id: str = Field(..., description="User ID")
+    value: int = Field(..., description="Ranked value - points or streak days")
+
+
+class Leaderboard(BaseModel):
+    """
+    Cached top-N snapshot of a leaderboard.
+    """
+    board: LeaderboardBoard
+    period: Optional[str] = Field(None, description="ISO week for weekly boards, e.g. '2024-W03'")
+    generated_at: str = Field(..., description="When the snapshot was computed")
+    entries: List[LeaderboardEntry] = Field(..., description="Top entries in rank order")
+
+
+class LeaderboardRank(BaseModel):
+    """
+    A single user's position on a leaderboard.
+    """
+    board: LeaderboardBoard
+    period: Optional[str] = Field(None, description="ISO week for weekly boards")
+    user_id: str = Field(..., description="User ID")
+    value: int = Field(..., description="The user's ranked value")
+    rank: Optional[int] = Field(None, description="Rank, None if the user is not on the board")
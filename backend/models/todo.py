@@ -66,10 +66,44 @@ class TodoPatch(BaseModel):
     goal: Optional[str] = Field(None, description="Goal or objective of the todo collection")
     todos: Optional[List[TodoItem]] = Field(None, description="List of todo items")
 
+class TodoListItem(TodoPatch):
+    """
+    Todo entry as returned by the list endpoint. Fields outside the requested
+    projection are omitted from the response.
+    """
+    id: Optional[str] = Field(None, description="MongoDB object ID")
+
+
 class TodoItemPatch(BaseModel):
     text: str = None
     status: bool = None
 
+class TodoItemBatchEntry(BaseModel):
+    """
+    A single item change within a batch update.
+    """
+    id: str = Field(..., description="Id of the todo item to update")
+    text: Optional[str] = Field(None, description="New content text of the todo item")
+    status: Optional[bool] = Field(None, description="New status of the todo item")
+
+
+class TodoItemsBatchPatch(BaseModel):
+    """
+    Batch of item changes applied to one todo list in a single write.
+    """
+    items: List[TodoItemBatchEntry] = Field(..., min_length=1, description="Item changes to apply")
+
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "items": [
+                    {"id": "1", "status": True},
+                    {"id": "2", "status": True},
+                    {"id": "3", "text": "45 minutes cardio"}
+                ]
+            }
+        }
+
 # MongoDB Schema Validation
 todo_schema = {
     "$jsonSchema": {
@@ -0,0 +1,42 @@
+import os
+from typing import Any, Dict, Optional
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel
+
+
+# Schnelle Antworten für vertrauenswürdige Daten: orjson statt erneuter response_model-Validierung
+FAST_RESPONSES_ENABLED = os.getenv("FAST_RESPONSES_ENABLED", "1") == "1"
+
+
+def _default(value: Any):
+    if isinstance(value, ObjectId):
+        return str(value)
+    if isinstance(value, BaseModel):
+        return value.model_dump(mode="json")
+    raise TypeError(f"Type is not JSON serializable: {type(value).__name__}")
+
+
+class FastJSONResponse(ORJSONResponse):
+    """orjson response that also serializes ObjectIds and Pydantic models."""
+
+    def render(self, content: Any) -> bytes:
+        return orjson.dumps(content, default=_default, option=orjson.OPT_NON_STR_KEYS)
+
+
+def trusted_response(content: Any, headers: Optional[Dict[str, str]] = None):
+    """
+    Opt-in fast path for handlers whose data is already in the shape of their
+    response_model - read from our own documents or validated when the
+    catalog was loaded. Returning a Response makes FastAPI skip the
+    response_model validation and jsonable_encoder; the OpenAPI schema still
+    comes from response_model.
+
+    With FAST_RESPONSES_ENABLED=0 the content is returned unchanged and goes
+    through the regular validation.
+    """
+    if not FAST_RESPONSES_ENABLED:
+        return content
+    return FastJSONResponse(content, headers=headers)
@@ -1,11 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from fastapi import APIRouter, Depends, HTTPException, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel, Field
 from typing import Optional, Dict, List
-from ai.collector import start_skill_collection, continue_skill_collection, CollectorResponse, SkillData
+import json
+from ai.collector import astart_skill_collection, acontinue_skill_collection, extractor_stats, CollectorResponse, SkillData
+from ai.generator import agenerate_skill_plan, astream_skill_plan
+from ai.plan_cache import plan_cache
+from ai.sessions import new_session_id, session_store
+from ai.llm import llm_route
+from instrumentation import check_metrics_token
 
 
 class ChatMessage(BaseModel):
     message: str = Field(..., description="User message for skill information collection")
+    session_id: Optional[str] = Field(None, description="Session ID - setzt eine gespeicherte Sammlung fort (nur /collect)")
 
 
 class ContinueCollectionRequest(BaseModel):
@@ -14,12 +22,47 @@ class ContinueCollectionRequest(BaseModel):
 
 
 class SkillCollectionSession(BaseModel):
-    session_id: Optional[str] = Field(None, description="Session ID für Konversations-Tracking")
-    current_data: Optional[Dict] = Field(None, description="Aktuelle Skill-Daten")
+    session_id: Optional[str] = Field(None, description="Session ID für Konversations-Tracking - ohne ID wird eine neue Session angelegt")
+    current_data: Optional[Dict] = Field(None, description="Aktuelle Skill-Daten - nur nötig, wenn der Server die Session nicht kennt")
     message: str = Field(..., description="User message")
 
 
-router = APIRouter()
+async def track_llm_route(request: Request):
+    """
+    Ordnet alle LLM-Aufrufe dieses Requests der Route zu (für die Metriken)
+    """
+    route = request.scope.get("route")
+    llm_route.set(route.path if route is not None else request.url.path)
+
+
+router = APIRouter(dependencies=[Depends(track_llm_route)])
+
+
+async def collect_in_session(session_id: Optional[str], message: str, current_data: Optional[Dict] = None) -> Dict:
+    """
+    Führt einen Sammlungsschritt mit serverseitig gespeichertem Zustand aus.
+    Abgeschlossene Sessions werden ohne LLM-Aufruf beantwortet.
+    """
+    session = await session_store.get(session_id) if session_id else None
+    session_id = session_id or new_session_id()
+
+    if session is not None:
+        stored = session["response"]
+        if stored.get("status") == "complete":
+            session_store.record_skipped_llm_call()
+            return {**stored, "session_id": session_id}
+        current_data = stored.get("current_data")
+
+    if current_data and any(current_data.values()):
+        # Fortsetzung einer bestehenden Session
+        response = await acontinue_skill_collection(current_data, message)
+    else:
+        # Neue Session starten
+        response = await astart_skill_collection(message)
+
+    await session_store.save(session_id, session, message, response)
+    response["session_id"] = session_id
+    return response
 
 
 @router.post("/collect-start", response_model=Dict)
@@ -28,7 +71,7 @@ async def start_collection(request: ChatMessage):
     Startet den Informationssammlungsprozess für Skill-Entwicklung
     """
     try:
-        response = start_skill_collection(request.message)
+        response = await astart_skill_collection(request.message)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error starting collection: {str(e)}")
@@ -40,7 +83,7 @@ async def continue_collection(request: ContinueCollectionRequest):
     Setzt den Informationssammlungsprozess mit bereits vorhandenen Daten fort
     """
     try:
-        response = continue_skill_collection(request.current_data, request.message)
+        response = await acontinue_skill_collection(request.current_data, request.message)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error continuing collection: {str(e)}")
@@ -50,14 +93,10 @@ async def continue_collection(request: ContinueCollectionRequest):
 async def collect_skill_info(request: ChatMessage):
     """
     Universelle Route für Informationssammlung - startet automatisch oder setzt fort
-    Basiert auf dem Kontext in der Nachricht
+    Mit session_id wird die gespeicherte Session fortgesetzt, sonst eine neue angelegt
     """
     try:
-        # Für Einfachheit starten wir immer neu - in einer echten App würden Sie 
-        # Session-Management implementieren
-        response = start_skill_collection(request.message)
-        
-        return response
+        return await collect_in_session(request.session_id, request.message)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error collecting information: {str(e)}")
 
@@ -67,19 +106,11 @@ async def collect_with_session(request: SkillCollectionSession):
     """
     Intelligente Informationssammlung mit Session-Support
     - Erkennt automatisch ob neue Session oder Fortsetzung
-    - Verwaltet den Sammlungsfortschritt
+    - Verwaltet den Sammlungsfortschritt serverseitig - der Client sendet nur die neue Nachricht
+    - Abgeschlossene Sessions werden ohne LLM-Aufruf beantwortet
     """
     try:
-        if request.current_data and any(request.current_data.values()):
-            # Fortsetzung einer bestehenden Session
-            response = continue_skill_collection(request.current_data, request.message)
-        else:
-            # Neue Session starten
-            response = start_skill_collection(request.message)
-        
-        # Füge Session-Tracking hinzu
-        if request.session_id:
-            response["session_id"] = request.session_id
+        response = await collect_in_session(request.session_id, request.message, request.current_data)
 
         print(f"Session response: {response}")
 
@@ -89,13 +120,63 @@ async def collect_with_session(request: SkillCollectionSession):
 
 
 @router.post("/generate-skill", response_model=Dict)
-async def generate_skill_plan(request: Dict):
+async def generate_skill_plan(request: Dict, force_regenerate: bool = False):
     """
     Generiert einen SkillItem-Plan aus vollständigen Collector-Daten
+    - force_regenerate=true umgeht den Plan-Cache
     """
     try:
-        from ai.generator import generate_skill_plan as generator_function
-        response = generator_function(request)
+        response = await agenerate_skill_plan(request, use_cache=not force_regenerate)
         return response
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Error generating skill plan: {str(e)}")
+
+
+@router.post("/generate-skill/stream")
+async def stream_skill_plan(request: Dict, force_regenerate: bool = False):
+    """
+    Generiert einen SkillItem-Plan als Server-Sent Events:
+    title, goal, icon, color, tip und danach jedes todo, sobald es fertig ist.
+    Das abschließende "done"-Event enthält den vollständigen Plan.
+    - force_regenerate=true umgeht den Plan-Cache
+    """
+    if request.get('status') != 'complete':
+        raise HTTPException(status_code=500, detail="Error generating skill plan: Cannot generate plan from incomplete collector data")
+
+    async def event_stream():
+        try:
+            async for event, data in astream_skill_plan(request, use_cache=not force_regenerate):
+                yield f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
+        except Exception as e:
+            payload = json.dumps({"detail": f"Error generating skill plan: {str(e)}"}, ensure_ascii=False)
+            yield f"event: error\ndata: {payload}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@router.get("/cache/stats", response_model=Dict, include_in_schema=False, dependencies=[Depends(check_metrics_token)])
+async def plan_cache_stats():
+    """
+    Hit/Miss-Zähler des Plan-Caches
+    """
+    return plan_cache.stats()
+
+
+@router.get("/sessions/stats", response_model=Dict, include_in_schema=False, dependencies=[Depends(check_metrics_token)])
+async def collector_session_stats():
+    """
+    Zähler des Session-Stores
+    """
+    return session_store.stats()
+
+
+@router.get("/collector/stats", response_model=Dict, include_in_schema=False, dependencies=[Depends(check_metrics_token)])
+async def collector_extractor_stats():
+    """
+    Trefferquoten der regelbasierten Vorextraktion und eingesparte LLM-Zeit
+    """
+    return extractor_stats()
@@ -1,8 +1,9 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, status
 from fastapi.responses import JSONResponse
-from typing import List, Optional
+from typing import Iterable, List, Optional, Set
 from pymongo.database import Database
-from pymongo.errors import DuplicateKeyError
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
 from bson import ObjectId
 from datetime import datetime, timezone, timedelta, timedelta
 import asyncio
@@ -12,11 +13,35 @@ from models.gamification import (
     UserStats, UserStatsUpdate, UserStatsResponse,
     Achievement, UserAchievement, PointsEntry,
     LevelConfig, GamificationSummary, AchievementWithProgress,
-    PointsReason, ConditionType
+    PointsReason, ConditionType,
+    Leaderboard, LeaderboardBoard, LeaderboardRank
 )
+from services.catalog import catalog, get_catalog, bump_catalog_version
+from services.ledger import append_entries
+from services import leaderboard
+from responses import trusted_response
 
 router = APIRouter(prefix="/gamification", tags=["gamification"])
 
+_catalog_watch_task = None
+
+# Number of processed gamification event (and daily login) ids remembered per user for deduplication
+APPLIED_EVENTS_KEPT = 200
+
+DAILY_LOGIN_POINTS = 10
+
+# Stat compared against the condition_value of each achievement condition type
+CONDITION_STAT_FIELDS = {
+    ConditionType.TODO_COUNT: "total_todos_completed",
+    ConditionType.SKILL_COUNT: "total_skills_completed",
+    ConditionType.STREAK_DAYS: "streak_count",
+    ConditionType.POINTS_TOTAL: "total_points",
+}
+
+# Sizes of the lists in the gamification summary
+SUMMARY_RECENT_ACHIEVEMENTS = 10
+SUMMARY_RECENT_POINTS = 20
+
 # Default level configurations
 DEFAULT_LEVELS = [
     {"level": 1, "points_required": 0, "title": "Newbie", "rewards": ["Getting started!"], "color": "#4CAF50"},
@@ -108,17 +133,30 @@ DEFAULT_ACHIEVEMENTS = [
 ]
 
 
-async def init_gamification_data(db: Database):
-    """Initialize default levels and achievements if they don't exist."""
-    # Initialize levels
-    levels_collection = db.get_collection("levels")
-    if await levels_collection.count_documents({}) == 0:
-        await levels_collection.insert_many(DEFAULT_LEVELS)
-    
-    # Initialize achievements
-    achievements_collection = db.get_collection("achievements")
-    if await achievements_collection.count_documents({}) == 0:
-        await achievements_collection.insert_many(DEFAULT_ACHIEVEMENTS)
+async def init_gamification_data(db: Database) -> dict:
+    """
+    Bring default levels (by level) and achievements (by name) in line with
+    DEFAULT_LEVELS / DEFAULT_ACHIEVEMENTS. Other documents are left alone.
+    """
+    report = {}
+    for name, key, defaults in (
+        ("levels", "level", DEFAULT_LEVELS),
+        ("achievements", "name", DEFAULT_ACHIEVEMENTS),
+    ):
+        collection = db.get_collection(name)
+        counts = {"upserted": 0, "modified": 0}
+        for default in defaults:
+            # Without _id - insert_many used to add one to the module-level defaults
+            fields = {field: value for field, value in default.items() if field != "_id"}
+            result = await collection.update_one({key: default[key]}, {"$set": fields}, upsert=True)
+            counts["upserted"] += result.upserted_id is not None
+            counts["modified"] += result.modified_count
+        report[name] = counts
+
+    # Let every worker reload its cached catalog
+    if any(counts["upserted"] or counts["modified"] for counts in report.values()):
+        await bump_catalog_version(db)
+    return report
 
 
 async def get_or_create_user_stats(db: Database, user_id: str) -> UserStats:
@@ -130,7 +168,11 @@ async def get_or_create_user_stats(db: Database, user_id: str) -> UserStats:
     if not user_stats:
         # Create new user stats
         new_stats = UserStats(user_id=user_id)
-        result = await stats_collection.insert_one(new_stats.dict(exclude={"id"}))
+        try:
+            result = await stats_collection.insert_one(new_stats.dict(exclude={"id"}))
+        except DuplicateKeyError:
+            # A concurrent request created the stats first (unique user_id index)
+            return await get_or_create_user_stats(db, user_id)
         new_stats.id = str(result.inserted_id)
         return new_stats
     
@@ -142,111 +184,113 @@ async def get_or_create_user_stats(db: Database, user_id: str) -> UserStats:
 
 async def calculate_level_info(total_points: int, db: Database):
     """Calculate current level and progress."""
-    levels_collection = db.get_collection("levels")
-    levels = await levels_collection.find().sort("level", 1).to_list(None)
-    
-    current_level = 1
-    current_level_progress = 0.0
-    points_to_next_level = 0
-    next_level_title = "Max Level"
-    
-    for i, level in enumerate(levels):
-        if total_points >= level["points_required"]:
-            current_level = level["level"]
-        else:
-            # This is the next level to reach
-            if i > 0:
-                prev_level_points = levels[i-1]["points_required"]
-                level_points_needed = level["points_required"] - prev_level_points
-                points_earned_in_level = total_points - prev_level_points
-                current_level_progress = (points_earned_in_level / level_points_needed) * 100
-            else:
-                current_level_progress = (total_points / level["points_required"]) * 100
-            
-            points_to_next_level = level["points_required"] - total_points
-            next_level_title = level["title"]
-            break
-    
-    return current_level, current_level_progress, points_to_next_level, next_level_title
+    catalog = await get_catalog(db)
+    return catalog.level_info(total_points)
 
 
-async def check_and_unlock_achievements(db: Database, user_id: str, user_stats: UserStats):
-    """Check if user has unlocked any new achievements."""
-    achievements_collection = db.get_collection("achievements")
-    user_achievements_collection = db.get_collection("user_achievements")
-    
-    # Get all achievements
-    all_achievements = await achievements_collection.find().to_list(None)
-    
-    # Get user's unlocked achievements
-    unlocked_ids = []
-    async for ua in user_achievements_collection.find({"user_id": user_id}):
-        unlocked_ids.append(ua["achievement_id"])
+def touched_condition_types(update: UserStatsUpdate, points_changed: bool = False) -> Set[ConditionType]:
+    """Condition types whose stat can have changed through an update."""
+    touched = set()
+    if update.todos_completed:
+        touched.add(ConditionType.TODO_COUNT)
+    if update.skills_completed:
+        touched.add(ConditionType.SKILL_COUNT)
+    if update.update_streak:
+        touched.add(ConditionType.STREAK_DAYS)
+    if points_changed or update.points_to_add:
+        touched.add(ConditionType.POINTS_TOTAL)
+    return touched
+
+
+async def check_and_unlock_achievements(
+    db: Database, user_id: str, user_stats: UserStats, condition_types: Optional[Iterable[ConditionType]] = None
+):
+    """
+    Check if user has unlocked any new achievements.
+
+    Only the given condition types are evaluated (all of them by default).
+    The unlocked ids embedded in user_stats make this query-free unless
+    something was actually unlocked.
+    """
+    catalog = await get_catalog(db)
+    unlocked_ids = set(user_stats.unlocked_achievements)
+    
+    candidates = []
+    for condition_type in condition_types if condition_types is not None else CONDITION_STAT_FIELDS:
+        value = getattr(user_stats, CONDITION_STAT_FIELDS[condition_type])
+        for achievement in catalog.reached_achievements(condition_type, value):
+            if str(achievement["_id"]) not in unlocked_ids:
+                candidates.append(achievement)
+    
+    if not candidates:
+        return []
+    
+    unlocked_at = datetime.now().isoformat()
+    user_achievements = [
+        UserAchievement(
+            user_id=user_id,
+            achievement_id=str(achievement["_id"]),
+            unlocked_at=unlocked_at,
+            is_seen=False
+        )
+        for achievement in candidates
+    ]
     
-    newly_unlocked = []
+    inserted = set(range(len(user_achievements)))
+    try:
+        await db.get_collection("user_achievements").insert_many(
+            [ua.dict(exclude={"id"}) for ua in user_achievements], ordered=False
+        )
+    except BulkWriteError as e:
+        # Already unlocked - by a concurrent request or an earlier attempt of this update
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != 11000 for error in errors):
+            raise
+        inserted -= {error["index"] for error in errors}
+    
+    # Reward every candidate: an attempt that failed after the insert left its
+    # rewards unwritten, and the idempotency keys make the ledger skip the
+    # ones that were written (one insert_many, so total_points includes them)
+    reward_entries = [
+        PointsEntry(
+            user_id=user_id,
+            points=achievement["points_reward"],
+            reason=PointsReason.ACHIEVEMENT_UNLOCKED,
+            reference_id=user_achievement.achievement_id,
+            metadata={"achievement_name": achievement["name"]}
+        )
+        for achievement, user_achievement in zip(candidates, user_achievements)
+    ]
+    await append_entries(
+        db, user_id, reward_entries,
+        [f"achievement:{user_id}:{ua.achievement_id}" for ua in user_achievements]
+    )
     
-    for achievement in all_achievements:
-        achievement_id = str(achievement["_id"])
-        
-        # Skip if already unlocked
-        if achievement_id in unlocked_ids:
-            continue
-        
-        # Check if condition is met
-        condition_met = False
-        condition_type = achievement["condition_type"]
-        condition_value = achievement["condition_value"]
-        
-        if condition_type == "todo_count":
-            condition_met = user_stats.total_todos_completed >= condition_value
-        elif condition_type == "skill_count":
-            condition_met = user_stats.total_skills_completed >= condition_value
-        elif condition_type == "streak_days":
-            condition_met = user_stats.streak_count >= condition_value
-        elif condition_type == "points_total":
-            condition_met = user_stats.total_points >= condition_value
-        
-        if condition_met:
-            # Unlock achievement
-            user_achievement = UserAchievement(
-                user_id=user_id,
-                achievement_id=achievement_id,
-                unlocked_at=datetime.now().isoformat(),
-                is_seen=False
-            )
-            
-            await user_achievements_collection.insert_one(user_achievement.dict(exclude={"id"}))
-            
-            # Award points
-            points_entry = PointsEntry(
-                user_id=user_id,
-                points=achievement["points_reward"],
-                reason=PointsReason.ACHIEVEMENT_UNLOCKED,
-                reference_id=achievement_id,
-                metadata={"achievement_name": achievement["name"]}
-            )
-            
-            await db.get_collection("points_history").insert_one(points_entry.dict(exclude={"id"}))
-            newly_unlocked.append(user_achievement)
+    # Only now skip these candidates in later checks, so a retry still reaches the rewards
+    await db.get_collection("user_stats").update_one(
+        {"user_id": user_id},
+        {"$addToSet": {"unlocked_achievements": {"$each": [ua.achievement_id for ua in user_achievements]}}}
+    )
     
+    newly_unlocked = [user_achievements[index] for index in sorted(inserted)]
     return newly_unlocked
 
 
 @router.on_event("startup")
 async def startup_gamification():
-    """Initialize gamification data on startup."""
+    """Load the gamification catalog on startup (seeding is a migration step)."""
     db = await get_database()
-    await init_gamification_data(db)
+    await catalog.ensure_fresh(db)
 
+    # Keep a reference so the watcher task is not garbage collected
+    global _catalog_watch_task
+    _catalog_watch_task = asyncio.create_task(catalog.watch(db))
 
-@router.get("/stats/{user_id}", response_model=UserStatsResponse)
-async def get_user_stats(user_id: str, db: Database = Depends(get_database)):
-    """Get user's gamification statistics."""
-    user_stats = await get_or_create_user_stats(db, user_id)
-    
-    # Calculate level info
-    current_level, current_level_progress, points_to_next_level, next_level_title = await calculate_level_info(
-        user_stats.total_points, db
+
+def build_stats_response(user_stats: UserStats, catalog) -> UserStatsResponse:
+    """Attach the level info resolved from the catalog to the stats."""
+    current_level, current_level_progress, points_to_next_level, next_level_title = catalog.level_info(
+        user_stats.total_points
     )
     
     # Update calculated fields
@@ -260,73 +304,158 @@ async def get_user_stats(user_id: str, db: Database = Depends(get_database)):
     )
 
 
+@router.get("/stats/{user_id}", response_model=UserStatsResponse)
+async def get_user_stats(user_id: str, db: Database = Depends(get_database)):
+    """Get user's gamification statistics."""
+    user_stats, catalog = await asyncio.gather(get_or_create_user_stats(db, user_id), get_catalog(db))
+    return build_stats_response(user_stats, catalog)
+
+
+def build_stats_update_pipeline(update: UserStatsUpdate, now_utc: datetime, event_id: Optional[str] = None) -> List[dict]:
+    """
+    Build an update pipeline that applies a UserStatsUpdate server-side.
+
+    Counters are added to the stored values and the streak is evaluated
+    against the stored last_active_date inside MongoDB, so concurrent
+    updates for the same user cannot overwrite each other. Missing fields
+    fall back to the UserStats defaults, which also makes the pipeline
+    usable for upserts. With an event_id the id is remembered in
+    applied_events so that a redelivered event can be recognised.
+    """
+    now_iso = now_utc.isoformat()
+    update_streak = bool(update.update_streak)
+
+    def incremented(field: str, amount: Optional[int]):
+        return {"$add": [{"$ifNull": [f"${field}", 0]}, amount or 0]}
+
+    stage = {
+        # total_points is materialized from the points ledger, see services.ledger
+        "total_points": {"$ifNull": ["$total_points", 0]},
+        "total_todos_completed": incremented("total_todos_completed", update.todos_completed),
+        "total_skills_completed": incremented("total_skills_completed", update.skills_completed),
+        "current_level": {"$ifNull": ["$current_level", 1]},
+        "current_level_progress": {"$ifNull": ["$current_level_progress", 0.0]},
+        "streak_count": {"$ifNull": ["$streak_count", 0]},
+        "longest_streak": {"$ifNull": ["$longest_streak", 0]},
+        "last_active_date": {"$ifNull": ["$last_active_date", now_iso]},
+        "created_at": {"$ifNull": ["$created_at", now_iso]},
+        "updated_at": now_iso,
+    }
+
+    if update_streak:
+        # Stored dates are ISO strings in UTC - compare on the UTC calendar day
+        last_active_day = {
+            "$dateFromString": {
+                "dateString": {"$substrCP": [{"$ifNull": ["$last_active_date", ""]}, 0, 10]},
+                "format": "%Y-%m-%d",
+                "onError": None,
+                "onNull": None,
+            }
+        }
+        today = {"$dateFromString": {"dateString": now_utc.date().isoformat(), "format": "%Y-%m-%d"}}
+        current_streak = {"$ifNull": ["$streak_count", 0]}
+
+        stage["streak_count"] = {
+            "$let": {
+                "vars": {"days_diff": {"$dateDiff": {"startDate": last_active_day, "endDate": today, "unit": "day"}}},
+                "in": {
+                    "$switch": {
+                        "branches": [
+                            # First activity always starts the streak at 1
+                            {"case": {"$eq": [current_streak, 0]}, "then": 1},
+                            # Unparseable date - treat as first time
+                            {"case": {"$eq": ["$$days_diff", None]}, "then": 1},
+                            # Consecutive day - increment streak
+                            {"case": {"$eq": ["$$days_diff", 1]}, "then": {"$add": [current_streak, 1]}},
+                            # Streak broken - reset to 1 (new start)
+                            {"case": {"$gt": ["$$days_diff", 1]}, "then": 1},
+                        ],
+                        # Same day - don't change streak
+                        "default": current_streak,
+                    }
+                },
+            }
+        }
+        stage["last_active_date"] = now_iso
+
+    if event_id:
+        stage["applied_events"] = {
+            "$slice": [
+                {"$concatArrays": [{"$ifNull": ["$applied_events", []]}, [event_id]]},
+                -APPLIED_EVENTS_KEPT
+            ]
+        }
+
+    return [
+        {"$set": stage},
+        {"$set": {"longest_streak": {"$max": ["$longest_streak", "$streak_count"]}}},
+    ]
+
+
+async def apply_user_stats_update(
+    db: Database, user_id: str, update: UserStatsUpdate, event_id: Optional[str] = None
+) -> Optional[UserStats]:
+    """
+    Apply a stats update atomically and return the post-image.
+
+    With an event_id the update is applied at most once per event; None is
+    returned when the event had already been applied.
+    """
+    stats_collection = db.get_collection("user_stats")
+    pipeline = build_stats_update_pipeline(update, datetime.now(timezone.utc), event_id)
+
+    query = {"user_id": user_id}
+    if event_id:
+        query["applied_events"] = {"$ne": event_id}
+
+    try:
+        updated = await stats_collection.find_one_and_update(
+            query,
+            pipeline,
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+    except DuplicateKeyError:
+        # Either the stats already contain the event, or a concurrent upsert (ledger
+        # reservation, another worker's event) created the document first. The
+        # $ne filter keeps the server from retrying, so update the now existing
+        # document without upsert.
+        updated = await stats_collection.find_one_and_update(
+            query,
+            pipeline,
+            return_document=ReturnDocument.AFTER,
+        )
+        if updated is None:
+            if event_id and await stats_collection.count_documents(
+                {"user_id": user_id, "applied_events": event_id}, limit=1
+            ):
+                return None
+            raise
+
+    updated["id"] = str(updated.pop("_id"))
+    return UserStats(**updated)
+
+
 @router.post("/stats/{user_id}/update")
 async def update_user_stats(user_id: str, update: UserStatsUpdate, db: Database = Depends(get_database)):
     """Update user statistics."""
-    user_stats = await get_or_create_user_stats(db, user_id)
-    
-    # Update stats
     if update.points_to_add:
-        user_stats.total_points += update.points_to_add
+        # Points only ever change through the ledger
+        await append_entries(db, user_id, [
+            PointsEntry(user_id=user_id, points=update.points_to_add, reason=PointsReason.ADJUSTMENT)
+        ])
     
-    if update.todos_completed:
-        user_stats.total_todos_completed += update.todos_completed
-    
-    if update.skills_completed:
-        user_stats.total_skills_completed += update.skills_completed
-    
-    if update.update_streak is not None and update.update_streak:
-        # Update streak logic using UTC consistently
-        now_utc = datetime.now(timezone.utc)
-        
-        try:
-            # Parse stored date as UTC
-            if user_stats.last_active_date.endswith('Z'):
-                last_active_utc = datetime.fromisoformat(user_stats.last_active_date.replace('Z', '+00:00'))
-            else:
-                # Assume UTC if no timezone info
-                last_active_utc = datetime.fromisoformat(user_stats.last_active_date).replace(tzinfo=timezone.utc)
-        except:
-            # If parsing fails, treat as first time
-            last_active_utc = datetime.min.replace(tzinfo=timezone.utc)
-            
-        # Special case: if streak is 0 or it's the first activity, always start at 1
-        if user_stats.streak_count == 0:
-            user_stats.streak_count = 1
-            user_stats.longest_streak = max(user_stats.longest_streak, 1)
-        else:
-            # Check if it's a new UTC day
-            if last_active_utc.date() < now_utc.date():
-                days_diff = (now_utc.date() - last_active_utc.date()).days
-                
-                if days_diff == 1:
-                    # Consecutive day - increment streak
-                    user_stats.streak_count += 1
-                elif days_diff > 1:
-                    # Streak broken - reset to 1 (new start)
-                    user_stats.streak_count = 1
-                # If days_diff == 0, it's the same day, don't change streak
-                
-                # Update longest streak
-                if user_stats.streak_count > user_stats.longest_streak:
-                    user_stats.longest_streak = user_stats.streak_count
-        
-        # Update timestamps with UTC
-        user_stats.last_active_date = now_utc.isoformat()
-        user_stats.updated_at = now_utc.isoformat()
-    else:
-        # Update only the updated_at timestamp for non-streak updates
-        user_stats.updated_at = datetime.now(timezone.utc).isoformat()
-    
-    # Save to database
-    stats_collection = db.get_collection("user_stats")
-    await stats_collection.update_one(
-        {"user_id": user_id},
-        {"$set": user_stats.dict(exclude={"id"})}
-    )
+    return await apply_update_and_unlock(db, user_id, update, points_changed=bool(update.points_to_add))
+
+
+async def apply_update_and_unlock(db: Database, user_id: str, update: UserStatsUpdate, points_changed: bool):
+    """Apply a stats update and evaluate the achievements it can have affected."""
+    user_stats = await apply_user_stats_update(db, user_id, update)
     
     # Check for new achievements
-    newly_unlocked = await check_and_unlock_achievements(db, user_id, user_stats)
+    newly_unlocked = await check_and_unlock_achievements(
+        db, user_id, user_stats, touched_condition_types(update, points_changed)
+    )
     
     return {
         "message": "Stats updated successfully",
@@ -352,37 +481,29 @@ async def add_points(
         reference_id=reference_id
     )
     
-    # Save to points history
-    await db.get_collection("points_history").insert_one(points_entry.dict(exclude={"id"}))
+    # Append to the points ledger - this also updates total_points
+    await append_entries(db, user_id, [points_entry])
     
     # Update user stats - for daily_login, also update streak
-    if reason == PointsReason.DAILY_LOGIN:
-        update = UserStatsUpdate(points_to_add=points, update_streak=True)
-    else:
-        update = UserStatsUpdate(points_to_add=points)
+    update = UserStatsUpdate(update_streak=reason == PointsReason.DAILY_LOGIN)
     
-    return await update_user_stats(user_id, update, db)
+    return await apply_update_and_unlock(db, user_id, update, points_changed=True)
 
 
-@router.get("/achievements/{user_id}")
-async def get_user_achievements(user_id: str, db: Database = Depends(get_database)):
-    """Get user's achievements with progress."""
-    # Get all achievements
-    achievements_collection = db.get_collection("achievements")
-    all_achievements = await achievements_collection.find().to_list(None)
-    
-    # Get user's unlocked achievements
-    user_achievements_collection = db.get_collection("user_achievements")
-    unlocked_achievements = await user_achievements_collection.find({"user_id": user_id}).to_list(None)
+def build_achievements_with_progress(
+    catalog, unlocked_achievements: List[dict], user_stats: UserStats
+) -> List[dict]:
+    """
+    Combine the achievement catalog with a user's unlocks and stats. Returns
+    dicts shaped like AchievementWithProgress - the catalog entries were
+    validated when the catalog was loaded.
+    """
     unlocked_dict = {ua["achievement_id"]: ua for ua in unlocked_achievements}
     
-    # Get user stats for progress calculation
-    user_stats = await get_or_create_user_stats(db, user_id)
-    
     achievements_with_progress = []
     
-    for achievement in all_achievements:
-        achievement_id = str(achievement["_id"])
+    for achievement in catalog.public_achievements():
+        achievement_id = achievement["id"]
         is_unlocked = achievement_id in unlocked_dict
         
         # Calculate progress
@@ -402,50 +523,102 @@ async def get_user_achievements(user_id: str, db: Database = Depends(get_databas
         else:
             progress = 100.0
         
-        achievement["id"] = achievement_id
-        del achievement["_id"]
-        
-        achievement_with_progress = AchievementWithProgress(
+        # Copy - the catalog entries are shared
+        achievements_with_progress.append({
             **achievement,
-            is_unlocked=is_unlocked,
-            progress=progress,
-            unlocked_at=unlocked_dict[achievement_id]["unlocked_at"] if is_unlocked else None
-        )
-        
-        achievements_with_progress.append(achievement_with_progress)
+            "is_unlocked": is_unlocked,
+            "progress": float(progress),
+            "unlocked_at": unlocked_dict[achievement_id]["unlocked_at"] if is_unlocked else None,
+        })
     
     return achievements_with_progress
 
 
+@router.get("/achievements/{user_id}", response_model=List[AchievementWithProgress])
+async def get_user_achievements(user_id: str, db: Database = Depends(get_database)):
+    """Get user's achievements with progress."""
+    user_achievements_collection = db.get_collection("user_achievements")
+    
+    # Catalog (usually cached), unlocks and stats are independent - fetch them concurrently
+    catalog, unlocked_achievements, user_stats = await asyncio.gather(
+        get_catalog(db),
+        user_achievements_collection.find({"user_id": user_id}).to_list(None),
+        get_or_create_user_stats(db, user_id)
+    )
+    
+    return trusted_response(build_achievements_with_progress(catalog, unlocked_achievements, user_stats))
+
+
+def summary_activity_pipeline(user_id: str) -> List[dict]:
+    """
+    One aggregation over user_achievements returning all of the user's unlocks
+    (newest first) and, through $unionWith, the latest points_history entries.
+    """
+    return [
+        {"$match": {"user_id": user_id}},
+        {"$unionWith": {
+            "coll": "points_history",
+            "pipeline": [
+                {"$match": {"user_id": user_id}},
+                {"$sort": {"created_at": -1}},
+                {"$limit": SUMMARY_RECENT_POINTS},
+                {"$set": {"_summary_source": "points"}},
+            ]
+        }},
+        {"$facet": {
+            "unlocked": [
+                {"$match": {"_summary_source": {"$exists": False}}},
+                {"$sort": {"unlocked_at": -1}},
+            ],
+            "recent_points": [
+                {"$match": {"_summary_source": "points"}},
+                {"$sort": {"created_at": -1}},
+                {"$unset": "_summary_source"},
+            ],
+        }},
+    ]
+
+
 @router.get("/summary/{user_id}", response_model=GamificationSummary)
 async def get_gamification_summary(user_id: str, db: Database = Depends(get_database)):
-    """Get comprehensive gamification summary for user."""
-    # Get user stats
-    stats_response = await get_user_stats(user_id, db)
+    """
+    Get comprehensive gamification summary for user.
+
+    Two round trips, issued concurrently: the stats document and one
+    aggregation for unlocks and recent points. Levels and achievements come
+    from the in-process catalog.
+    """
+    user_achievements_collection = db.get_collection("user_achievements")
+    
+    user_stats, catalog, activity = await asyncio.gather(
+        get_or_create_user_stats(db, user_id),
+        get_catalog(db),
+        user_achievements_collection.aggregate(summary_activity_pipeline(user_id)).to_list(1)
+    )
+    unlocked = activity[0]["unlocked"] if activity else []
+    points = activity[0]["recent_points"] if activity else []
+    
+    stats_response = build_stats_response(user_stats, catalog)
     
     # Get recent achievements (last 10)
-    user_achievements_collection = db.get_collection("user_achievements")
-    recent_achievements_cursor = user_achievements_collection.find({"user_id": user_id}).sort("unlocked_at", -1).limit(10)
     recent_achievements = []
-    async for ua in recent_achievements_cursor:
-        ua["id"] = str(ua["_id"])
+    for ua in unlocked[:SUMMARY_RECENT_ACHIEVEMENTS]:
+        ua = dict(ua, id=str(ua["_id"]))
         del ua["_id"]
         recent_achievements.append(UserAchievement(**ua))
     
-    # Get achievements close to unlocking (> 50% progress, not unlocked)
-    all_achievements_with_progress = await get_user_achievements(user_id, db)
+    # Get achievements close to unlocking (> 50% progress, not unlocked) - shares the stats fetched above
+    all_achievements_with_progress = build_achievements_with_progress(catalog, unlocked, user_stats)
     next_achievements = [
         a for a in all_achievements_with_progress 
-        if not a.is_unlocked and a.progress >= 50.0
+        if not a["is_unlocked"] and a["progress"] >= 50.0
     ]
-    next_achievements.sort(key=lambda x: x.progress, reverse=True)
+    next_achievements.sort(key=lambda x: x["progress"], reverse=True)
     next_achievements = next_achievements[:5]  # Top 5
     
     # Get recent points (last 20)
-    points_collection = db.get_collection("points_history")
-    recent_points_cursor = points_collection.find({"user_id": user_id}).sort("created_at", -1).limit(20)
     recent_points = []
-    async for pe in recent_points_cursor:
+    for pe in points:
         pe["id"] = str(pe["_id"])
         del pe["_id"]
         recent_points.append(PointsEntry(**pe))
@@ -481,103 +654,31 @@ async def mark_achievement_seen(
 @router.get("/levels", response_model=List[LevelConfig])
 async def get_levels(db: Database = Depends(get_database)):
     """Get all level configurations."""
-    levels_collection = db.get_collection("levels")
-    levels = await levels_collection.find().sort("level", 1).to_list(None)
-    
-    result = []
-    for level in levels:
-        level["id"] = str(level["_id"])
-        del level["_id"]
-        result.append(LevelConfig(**level))
-    
-    return result
+    catalog = await get_catalog(db)
+    return trusted_response(catalog.public_levels())
 
 
 @router.post("/daily-login/{user_id}")
 async def daily_login(user_id: str, db: Database = Depends(get_database)):
-    """Handle daily login - award points and update streak in one operation."""
-    user_stats = await get_or_create_user_stats(db, user_id)
-    
-    # Work in Central European Time (CET/CEST) for day comparison
-    # Germany is UTC+1 in winter, UTC+2 in summer
-    cet_timezone = timezone(timedelta(hours=2))  # Summer time (CEST)
-    now_cet = datetime.now(cet_timezone)
-    
-    # Check if daily login already happened today  
-    try:
-        # Parse stored date as UTC and convert to CET
-        if user_stats.last_active_date.endswith('Z'):
-            last_active_utc = datetime.fromisoformat(user_stats.last_active_date.replace('Z', '+00:00'))
-        else:
-            # Assume UTC if no timezone info
-            last_active_utc = datetime.fromisoformat(user_stats.last_active_date).replace(tzinfo=timezone.utc)
-        
-        # Convert to CET for day comparison
-        last_active_cet = last_active_utc.astimezone(cet_timezone)
-    except:
-        last_active_cet = datetime.min.replace(tzinfo=cet_timezone)
-    
-    print(f"Debug: last_active_cet={last_active_cet}, now_cet={now_cet}")
-    print(f"Debug: last_active date={last_active_cet.date()}, today date={now_cet.date()}")
-    
-    # Check if it's a new CET day
-    if last_active_cet.date() < now_cet.date() or user_stats.streak_count == 0:
-        # Award daily login points
-        points_entry = PointsEntry(
+    """Handle daily login - award points and update streak once per (UTC) day."""
+    today = datetime.now(timezone.utc).date().isoformat()
+    login_id = f"daily_login:{user_id}:{today}"
+
+    # Idempotent, so concurrent or repeated logins award the points once per day
+    await append_entries(db, user_id, [
+        PointsEntry(
             user_id=user_id,
-            points=10,
+            points=DAILY_LOGIN_POINTS,
             reason=PointsReason.DAILY_LOGIN,
-            reference_id=f"daily_login_{now_cet.date()}"
+            reference_id=f"daily_login_{today}"
         )
-        
-        # Save to points history
-        await db.get_collection("points_history").insert_one(points_entry.dict(exclude={"id"}))
-        
-        # Update user stats with both points and streak
-        user_stats.total_points += 10
-        
-        # Update streak logic
-        if user_stats.streak_count == 0:
-            user_stats.streak_count = 1
-            user_stats.longest_streak = max(user_stats.longest_streak, 1)
-        else:
-            if last_active_cet.date() < now_cet.date():
-                days_diff = (now_cet.date() - last_active_cet.date()).days
-                
-                if days_diff == 1:
-                    # Consecutive day - increment streak
-                    user_stats.streak_count += 1
-                elif days_diff > 1:
-                    # Streak broken - reset to 1 (new start)
-                    user_stats.streak_count = 1
-                
-                # Update longest streak
-                if user_stats.streak_count > user_stats.longest_streak:
-                    user_stats.longest_streak = user_stats.streak_count
-        
-        # Update timestamps (store as UTC)
-        now_utc = datetime.now(timezone.utc)
-        user_stats.last_active_date = now_utc.isoformat()
-        user_stats.updated_at = now_utc.isoformat()
-        
-        # Save to database
-        stats_collection = db.get_collection("user_stats")
-        await stats_collection.update_one(
-            {"user_id": user_id},
-            {"$set": user_stats.dict(exclude={"id"})}
-        )
-        
-        # Check for new achievements
-        newly_unlocked = await check_and_unlock_achievements(db, user_id, user_stats)
-        
-        return {
-            "message": "Daily login successful",
-            "points_awarded": 10,
-            "current_streak": user_stats.streak_count,
-            "newly_unlocked_achievements": len(newly_unlocked),
-            "new_achievements": [ua.dict() for ua in newly_unlocked]
-        }
-    else:
+    ], [login_id])
+
+    # Day comparison and streak run in the update pipeline; the login id lands in
+    # applied_events, so only the first login of the day gets past it
+    user_stats = await apply_user_stats_update(db, user_id, UserStatsUpdate(update_streak=True), event_id=login_id)
+    if user_stats is None:
+        user_stats = await get_or_create_user_stats(db, user_id)
         return {
             "message": "Daily login already completed today",
             "points_awarded": 0,
@@ -585,3 +686,32 @@ async def daily_login(user_id: str, db: Database = Depends(get_database)):
             "newly_unlocked_achievements": 0,
             "new_achievements": []
         }
+
+    # Check for new achievements
+    newly_unlocked = await check_and_unlock_achievements(
+        db, user_id, user_stats, [ConditionType.STREAK_DAYS, ConditionType.POINTS_TOTAL]
+    )
+
+    return {
+        "message": "Daily login successful",
+        "points_awarded": DAILY_LOGIN_POINTS,
+        "current_streak": user_stats.streak_count,
+        "newly_unlocked_achievements": len(newly_unlocked),
+        "new_achievements": [ua.dict() for ua in newly_unlocked]
+    }
+
+
+@router.get("/leaderboard/{board}", response_model=Leaderboard)
+async def get_leaderboard(
+    board: LeaderboardBoard,
+    limit: int = Query(10, ge=1, le=leaderboard.LEADERBOARD_TOP_N),
+    db: Database = Depends(get_database)
+):
+    """Get the top users of a leaderboard (served from a periodically refreshed snapshot)."""
+    return await leaderboard.get_top(db, board, limit)
+
+
+@router.get("/leaderboard/{board}/rank/{user_id}", response_model=LeaderboardRank)
+async def get_leaderboard_rank(board: LeaderboardBoard, user_id: str, db: Database = Depends(get_database)):
+    """Get a user's current rank on a leaderboard."""
+    return await leaderboard.get_rank(db, board, user_id)
@@ -1,11 +1,15 @@
-from fastapi import APIRouter, HTTPException, Depends, status
-from typing import List
+from fastapi import APIRouter, HTTPException, Depends, Query, Response, status
+from typing import List, Optional
+import base64
+import copy
 from pymongo.database import Database
 from bson import ObjectId
 from bson.errors import InvalidId
+from pymongo import ReturnDocument
 from database import get_database
-from models.todo import Todo, TodoItem, TodoPatch, TodoItemPatch
-from models.gamification import PointsReason, UserStatsUpdate
+from models.todo import Todo, TodoItem, TodoPatch, TodoItemPatch, TodoListItem, TodoItemsBatchPatch
+from services.gamification_events import ITEMS_CHANGED, USER_ACTIVITY, record_event, run_with_outbox
+from responses import trusted_response
 
 router = APIRouter(
     prefix="/todos",
@@ -13,6 +17,14 @@ router = APIRouter(
     responses={404: {"description": "Todo not found"}}
 )
 
+MAX_PAGE_SIZE = 100
+
+# Fields that may be requested through the list projection
+LIST_FIELDS = set(TodoListItem.model_fields) - {"id"}
+
+# Without an explicit projection only the response fields are read, so documents can be returned without validation
+DEFAULT_LIST_PROJECTION = {field: 1 for field in LIST_FIELDS}
+
 
 # Helper function to convert ObjectId to string in response
 def parse_todo(todo):
@@ -21,50 +33,91 @@ def parse_todo(todo):
     return todo
 
 
-async def award_points_for_todo_completion(db: Database, user_id: str, todo_id: str, points: int = 10):
-    """Award points when a todo item is completed."""
-    try:
-        # Import here to avoid circular imports
-        from routers.gamification import add_points
-        await add_points(user_id, points, PointsReason.TODO_COMPLETED, todo_id, db)
-    except Exception as e:
-        # Log error but don't fail the main operation
-        print(f"Error awarding points: {e}")
+def item_changes_event_payload(todo_id: str, before: dict, after: dict) -> Optional[dict]:
+    """Describe the gamification effects of item changes, None if no status changed."""
+    old_status = {item['id']: item.get('status', False) for item in before.get('todos', [])}
+    if all(item.get('status', False) == old_status.get(item['id'], False) for item in after.get('todos', [])):
+        return None
 
+    completed_ids = [
+        item['id'] for item in after.get('todos', [])
+        if item.get('status') and not old_status.get(item['id'], False)
+    ]
+
+    # At most one skill completion per write
+    total_todos = len(after.get('todos', []))
+    was_completed = total_todos > 0 and all(old_status.values())
+    skill_completed = bool(completed_ids) and not was_completed and all(item.get('status') for item in after['todos'])
+
+    return {
+        "todo_id": todo_id,
+        "completed_item_ids": completed_ids,
+        "skill_completed": skill_completed,
+        "skill_bonus": 25 + (total_todos * 5),  # Base 25 + 5 per todo
+    }
 
-async def award_points_for_skill_completion(db: Database, user_id: str, skill_id: str):
-    """Award points when a skill is completed (all todos done)."""
-    try:
-        # Import here to avoid circular imports
-        from routers.gamification import add_points, update_user_stats
-        
-        # Check if skill is actually completed
-        skill = await db.skills.find_one({"_id": ObjectId(skill_id)})
-        if skill:
-            completed_todos = sum(1 for todo in skill.get('todos', []) if todo.get('status'))
-            total_todos = len(skill.get('todos', []))
-            
-            if completed_todos == total_todos and total_todos > 0:
-                # Skill completed - award bonus points
-                bonus_points = 25 + (total_todos * 5)  # Base 25 + 5 per todo
-                await add_points(user_id, bonus_points, PointsReason.SKILL_COMPLETED, skill_id, db)
-                
-                # Update skill completion stats
-                update = UserStatsUpdate(skills_completed=1, update_streak=True)
-                await update_user_stats(user_id, update, db)
-    except Exception as e:
-        print(f"Error awarding skill completion points: {e}")
-
-
-async def update_user_activity(db: Database, user_id: str):
-    """Update user activity for streak tracking."""
-    try:
-        # Import here to avoid circular imports
-        from routers.gamification import update_user_stats
-        update = UserStatsUpdate(update_streak=True)
-        await update_user_stats(user_id, update, db)
-    except Exception as e:
-        print(f"Error updating user activity: {e}")
+
+def apply_item_changes(todo: dict, changes_by_id: dict) -> dict:
+    """Return a copy of the todo list with the item changes applied."""
+    updated = copy.deepcopy(todo)
+    for item in updated.get('todos', []):
+        if item.get('id') in changes_by_id:
+            item.update(changes_by_id[item['id']])
+    return updated
+
+
+async def apply_todo_item_updates(db: Database, object_id: ObjectId, changes_by_id: dict) -> dict:
+    """
+    Apply item changes to one todo list in a single find_one_and_update.
+
+    Items are addressed through arrayFilters on todos.id. The pre-image is
+    returned by the write and tells us which items were completed, so the
+    post-image is derived locally instead of reading the document again.
+    """
+    # Ein arrayFilter-Bezeichner pro Item, alle Änderungen in einem $set
+    set_fields = {}
+    array_filters = []
+    for index, (item_id, changes) in enumerate(changes_by_id.items()):
+        if not changes:
+            continue
+        set_fields.update({f"todos.$[i{index}].{key}": value for key, value in changes.items()})
+        array_filters.append({f"i{index}.id": item_id})
+
+    query = {"_id": object_id, "todos.id": {"$all": list(changes_by_id)}}
+
+    async def write(session) -> Optional[dict]:
+        if set_fields:
+            before = await db.skills.find_one_and_update(
+                query,
+                {"$set": set_fields},
+                array_filters=array_filters,
+                return_document=ReturnDocument.BEFORE,
+                session=session
+            )
+        else:
+            # Nothing to change - just return the todo list
+            before = await db.skills.find_one(query, session=session)
+
+        if before is None:
+            return None
+
+        after = apply_item_changes(before, changes_by_id)
+
+        # Gamification: record the aggregated effects, a background worker applies them
+        user_id = before.get('user')
+        payload = item_changes_event_payload(str(object_id), before, after)
+        if user_id and payload:
+            await record_event(db, ITEMS_CHANGED, user_id, payload, session=session)
+        return after
+
+    # Retried as a whole on transient transaction errors, so the 404 checks stay outside
+    after = await run_with_outbox(db, write)
+    if after is None:
+        if await db.skills.count_documents({"_id": object_id}, limit=1) == 0:
+            raise HTTPException(status_code=404, detail="Todo list not found")
+        raise HTTPException(status_code=404, detail="Todo item not found")
+
+    return parse_todo(after)
 
 
 @router.post("/", response_model=Todo, status_code=status.HTTP_201_CREATED)
@@ -73,29 +126,77 @@ async def create_todo(todo: Todo, db: Database = Depends(get_database)):
     # Convert to dict for MongoDB
     todo_dict = todo.model_dump(exclude={"id"})
     
-    # Insert into database
-    result = await db.skills.insert_one(todo_dict)
+    async def write(session):
+        # Insert into database - insert_one sets todo_dict["_id"], a retry reuses it
+        await db.skills.insert_one(todo_dict, session=session)
+        
+        # Gamification: Record user activity for creating a skill
+        user_id = todo.user
+        if user_id:
+            await record_event(db, USER_ACTIVITY, user_id, {}, session=session)
     
-    # Gamification: Update user activity for creating a skill
-    user_id = todo.user
-    if user_id:
-        await update_user_activity(db, user_id)
+    await run_with_outbox(db, write)
     
-    # Return created todo with ID
-    created_todo = await db.skills.find_one({"_id": result.inserted_id})
-    return parse_todo(created_todo)
+    # Return created todo with ID - the inserted document is already complete
+    return parse_todo(todo_dict)
 
 
-@router.get("/", response_model=List[Todo])
-async def get_todos(skip: int = 0, limit: int = 10, db: Database = Depends(get_database)):
-    """Get all todo lists with pagination"""
-    todos = []
-    cursor = db.skills.find().skip(skip).limit(limit)
-    
-    async for todo in cursor:
-        todos.append(parse_todo(todo))
-        
-    return todos
+def encode_cursor(object_id: ObjectId) -> str:
+    return base64.urlsafe_b64encode(object_id.binary).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+
+def parse_projection(fields: Optional[str]) -> dict:
+    if not fields:
+        return DEFAULT_LIST_PROJECTION
+    requested = {field.strip() for field in fields.split(",") if field.strip()}
+    unknown = requested - LIST_FIELDS
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(sorted(unknown))}")
+    return {field: 1 for field in requested}
+
+
+@router.get("/", response_model=List[TodoListItem], response_model_exclude_unset=True)
+async def get_todos(
+    response: Response,
+    user: Optional[str] = None,
+    cursor: Optional[str] = None,
+    fields: Optional[str] = None,
+    skip: int = 0,
+    limit: int = Query(10, ge=1, le=MAX_PAGE_SIZE),
+    db: Database = Depends(get_database)
+):
+    """
+    Get todo lists page by page, optionally only those of one user.
+
+    - cursor: opaque value from the X-Next-Cursor header of the previous page
+    - fields: comma separated projection, e.g. "title,icon,color" to omit the todos arrays
+    - skip: legacy offset paging, ignored when a cursor is given
+    """
+    query = {}
+    if user is not None:
+        query["user"] = user
+    if cursor:
+        query["_id"] = {"$gt": decode_cursor(cursor)}
+
+    # Keyset paging on (user, _id); fetch one extra document to detect the next page
+    find = db.skills.find(query, parse_projection(fields)).sort("_id", 1)
+    if skip and not cursor:
+        find = find.skip(skip)
+    documents = await find.limit(limit + 1).to_list(limit + 1)
+
+    if len(documents) > limit:
+        documents = documents[:limit]
+        response.headers["X-Next-Cursor"] = encode_cursor(documents[-1]["_id"])
+
+    # Projected fields of our own documents - no second validation through response_model needed
+    return trusted_response([parse_todo(todo) for todo in documents], headers=dict(response.headers))
 
 
 @router.get("/{todo_id}", response_model=Todo)
@@ -114,20 +215,14 @@ async def get_todo(todo_id: str, db: Database = Depends(get_database)):
 async def update_todo(todo_id: str, todo: Todo, db: Database = Depends(get_database)):
     """Update a todo list by ID"""
     try:
-        # Check if todo exists
-        existing = await db.skills.find_one({"_id": ObjectId(todo_id)})
-        if not existing:
-            raise HTTPException(status_code=404, detail="Todo not found")
-            
-        # Update the todo
         todo_dict = todo.dict(exclude={"id"})
-        await db.skills.update_one(
+        updated_todo = await db.skills.find_one_and_update(
             {"_id": ObjectId(todo_id)},
-            {"$set": todo_dict}
+            {"$set": todo_dict},
+            return_document=ReturnDocument.AFTER
         )
-        
-        # Return updated todo
-        updated_todo = await db.skills.find_one({"_id": ObjectId(todo_id)})
+        if not updated_todo:
+            raise HTTPException(status_code=404, detail="Todo not found")
         return parse_todo(updated_todo)
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid todo ID format")
@@ -137,26 +232,22 @@ async def update_todo(todo_id: str, todo: Todo, db: Database = Depends(get_datab
 async def partial_update_todo(todo_id: str, todo_update: TodoPatch, db: Database = Depends(get_database)):
     """Partially update a todo list by ID - only update the fields that are provided"""
     try:
-        # Check if todo exists
-        existing = await db.skills.find_one({"_id": ObjectId(todo_id)})
-        if not existing:
-            raise HTTPException(status_code=404, detail="Todo not found")
-        
         # Convert update data to dict and remove None values
         update_data = {k: v for k, v in todo_update.dict().items() if v is not None}
         
         if not update_data:
             # If no fields to update, just return the existing todo
-            return parse_todo(existing)
-            
-        # Update the todo with only the provided fields
-        await db.skills.update_one(
-            {"_id": ObjectId(todo_id)},
-            {"$set": update_data}
-        )
+            updated_todo = await db.skills.find_one({"_id": ObjectId(todo_id)})
+        else:
+            # Update the todo with only the provided fields
+            updated_todo = await db.skills.find_one_and_update(
+                {"_id": ObjectId(todo_id)},
+                {"$set": update_data},
+                return_document=ReturnDocument.AFTER
+            )
         
-        # Return updated todo
-        updated_todo = await db.skills.find_one({"_id": ObjectId(todo_id)})
+        if not updated_todo:
+            raise HTTPException(status_code=404, detail="Todo not found")
         return parse_todo(updated_todo)
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid todo ID format")
@@ -166,13 +257,9 @@ async def partial_update_todo(todo_id: str, todo_update: TodoPatch, db: Database
 async def delete_todo(todo_id: str, db: Database = Depends(get_database)):
     """Delete a todo list by ID"""
     try:
-        # Check if todo exists
-        todo = await db.skills.find_one({"_id": ObjectId(todo_id)})
-        if not todo:
+        deleted = await db.skills.find_one_and_delete({"_id": ObjectId(todo_id)}, projection={"_id": 1})
+        if not deleted:
             raise HTTPException(status_code=404, detail="Todo not found")
-            
-        # Delete the todo
-        await db.skills.delete_one({"_id": ObjectId(todo_id)})
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid todo ID format")
 
@@ -186,60 +273,33 @@ async def update_todo_item(
 ):
     """Update a specific todo item within a todo list"""
     try:
-        # Überprüfen, ob die Todo-Liste existiert
-        todo = await db.skills.find_one({"_id": ObjectId(todo_id)})
-        if not todo:
-            raise HTTPException(status_code=404, detail="Todo list not found")
-        
-        # Konvertiere Update-Daten zu Dict und entferne None-Werte
-        update_data = {k: v for k, v in item_update.dict().items() if v is not None}
-        
-        if not update_data:
-            # Wenn keine Felder zum Aktualisieren vorhanden sind,
-            # geben wir die unveränderte Todo-Liste zurück
-            return parse_todo(todo)
-        
-        # Finde den Index des zu aktualisierenden Todo-Items
-        item_index = None
-        old_status = None
-        for i, item in enumerate(todo['todos']):
-            if item['id'] == item_id:
-                item_index = i
-                old_status = item.get('status', False)
-                break
-        
-        if item_index is None:
-            raise HTTPException(status_code=404, detail="Todo item not found")
-            
-        # Aktualisiere die Felder des spezifischen Todo-Items
-        update_path = f"todos.{item_index}"
-        await db.skills.update_one(
-            {"_id": ObjectId(todo_id)},
-            {"$set": {f"{update_path}.{key}": value for key, value in update_data.items()}}
-        )
-        
-        # Gamification: Check if todo item was completed
-        new_status = update_data.get('status')
-        if new_status is not None and new_status != old_status:
-            user_id = todo.get('user')
-            if user_id and new_status:  # Todo was completed
-                # Award points for completing todo
-                await award_points_for_todo_completion(db, user_id, todo_id)
-                
-                # Update todo completion stats
-                from routers.gamification import update_user_stats
-                update_stats = UserStatsUpdate(todos_completed=1, update_streak=True)
-                await update_user_stats(user_id, update_stats, db)
-                
-                # Check if skill is now completed
-                await award_points_for_skill_completion(db, user_id, todo_id)
-            elif user_id:
-                # User was active, update streak
-                await update_user_activity(db, user_id)
-        
-        # Gib die aktualisierte Todo-Liste zurück
-        updated_todo = await db.skills.find_one({"_id": ObjectId(todo_id)})
-        return parse_todo(updated_todo)
-        
+        object_id = ObjectId(todo_id)
     except InvalidId:
-        raise HTTPException(status_code=400, detail="Invalid ID format")
\ No newline at end of file
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+
+    # Konvertiere Update-Daten zu Dict und entferne None-Werte
+    update_data = {k: v for k, v in item_update.dict().items() if v is not None}
+    return await apply_todo_item_updates(db, object_id, {item_id: update_data})
+
+
+@router.patch("/{todo_id}/items", response_model=Todo)
+async def update_todo_items(
+    todo_id: str,
+    batch: TodoItemsBatchPatch,
+    db: Database = Depends(get_database)
+):
+    """Update several todo items of one todo list in a single write"""
+    try:
+        object_id = ObjectId(todo_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid ID format")
+
+    item_ids = [entry.id for entry in batch.items]
+    if len(set(item_ids)) != len(item_ids):
+        raise HTTPException(status_code=400, detail="Each todo item may only appear once per batch")
+
+    changes_by_id = {
+        entry.id: {k: v for k, v in entry.dict(exclude={"id"}).items() if v is not None}
+        for entry in batch.items
+    }
+    return await apply_todo_item_updates(db, object_id, changes_by_id)
@@ -0,0 +1,172 @@
+import asyncio
+import os
+import time
+from bisect import bisect_right
+from typing import Dict, List, Optional, Tuple
+
+from pymongo.database import Database
+from pymongo.errors import PyMongoError
+
+from models.gamification import Achievement, LevelConfig
+
+
+# How often the version document is polled when no change stream is available
+CATALOG_REFRESH_SECONDS = float(os.getenv("CATALOG_REFRESH_SECONDS", "60"))
+
+CATALOG_META_COLLECTION = "catalog_meta"
+CATALOG_VERSION_ID = "gamification"
+CATALOG_COLLECTIONS = ["levels", "achievements"]
+
+
+class GamificationCatalog:
+    """
+    Process-local copy of the levels and achievements collections.
+
+    Both catalogs are loaded once and only reloaded when they change - either
+    signalled by a change stream (replica sets) or by a bumped version
+    document, which is polled at most every CATALOG_REFRESH_SECONDS.
+    """
+
+    def __init__(self):
+        self.levels: List[dict] = []
+        self.achievements: List[dict] = []
+        self.thresholds: List[int] = []
+        # condition_type -> (sorted condition values, achievements in the same order)
+        self.achievement_index: Dict[str, Tuple[List[int], List[dict]]] = {}
+        # API representations, validated once per loaded version
+        self._public_levels: Optional[List[dict]] = None
+        self._public_achievements: Optional[List[dict]] = None
+        self.version: Optional[int] = None
+        self._loaded = False
+        self._checked_at = 0.0
+        self._watching = False
+        self._lock = asyncio.Lock()
+
+    async def _load(self, db: Database, version: Optional[int]):
+        levels = await db.get_collection("levels").find().sort("level", 1).to_list(None)
+        achievements = await db.get_collection("achievements").find().to_list(None)
+
+        self.levels = levels
+        self.thresholds = [level["points_required"] for level in levels]
+        self.achievements = achievements
+        self.achievement_index = self._index_achievements(achievements)
+        self._public_levels = None
+        self._public_achievements = None
+        self.version = version
+        self._loaded = True
+        self._checked_at = time.monotonic()
+
+    @staticmethod
+    def _index_achievements(achievements: List[dict]) -> Dict[str, Tuple[List[int], List[dict]]]:
+        grouped: Dict[str, List[dict]] = {}
+        for achievement in achievements:
+            grouped.setdefault(achievement["condition_type"], []).append(achievement)
+
+        index = {}
+        for condition_type, group in grouped.items():
+            group.sort(key=lambda achievement: achievement["condition_value"])
+            index[condition_type] = ([achievement["condition_value"] for achievement in group], group)
+        return index
+
+    @staticmethod
+    def _public(model, document: dict) -> dict:
+        document = dict(document)
+        document["id"] = str(document.pop("_id"))
+        return model(**document).model_dump(mode="json")
+
+    def public_levels(self) -> List[dict]:
+        """Levels as returned by the API (LevelConfig), validated once per catalog version."""
+        if self._public_levels is None:
+            self._public_levels = [self._public(LevelConfig, level) for level in self.levels]
+        return self._public_levels
+
+    def public_achievements(self) -> List[dict]:
+        """Achievements as returned by the API, in catalog order, validated once per catalog version."""
+        if self._public_achievements is None:
+            self._public_achievements = [self._public(Achievement, achievement) for achievement in self.achievements]
+        return self._public_achievements
+
+    async def _stored_version(self, db: Database) -> int:
+        meta = await db.get_collection(CATALOG_META_COLLECTION).find_one({"_id": CATALOG_VERSION_ID})
+        return meta["version"] if meta else 0
+
+    async def ensure_fresh(self, db: Database):
+        if self._loaded and (self._watching or time.monotonic() - self._checked_at < CATALOG_REFRESH_SECONDS):
+            return
+
+        async with self._lock:
+            if self._loaded and (self._watching or time.monotonic() - self._checked_at < CATALOG_REFRESH_SECONDS):
+                return
+            version = await self._stored_version(db)
+            if self._loaded and version == self.version:
+                self._checked_at = time.monotonic()
+                return
+            await self._load(db, version)
+
+    def invalidate(self):
+        self._loaded = False
+
+    async def watch(self, db: Database):
+        """
+        Invalidate on every change to levels/achievements. Falls back to
+        version polling when the deployment does not support change streams.
+        """
+        pipeline = [{"$match": {"ns.coll": {"$in": CATALOG_COLLECTIONS}}}]
+        try:
+            async with db.watch(pipeline) as stream:
+                self._watching = True
+                # Changes made before the stream opened would otherwise be missed
+                self.invalidate()
+                async for _ in stream:
+                    self.invalidate()
+        except PyMongoError as e:
+            print(f"Catalog change stream unavailable, polling version document instead: {e}")
+        finally:
+            self._watching = False
+
+    def reached_achievements(self, condition_type: str, value: int) -> List[dict]:
+        """All achievements of a condition type whose threshold is reached by value (bisect)."""
+        thresholds, achievements = self.achievement_index.get(condition_type, ([], []))
+        return achievements[:bisect_right(thresholds, value)]
+
+    def level_info(self, total_points: int) -> Tuple[int, float, int, str]:
+        """
+        Resolve (current_level, progress, points_to_next_level, next_level_title)
+        with a bisect over the precomputed level thresholds.
+        """
+        reached = bisect_right(self.thresholds, total_points)
+
+        if reached == len(self.levels):
+            current_level = self.levels[-1]["level"] if self.levels else 1
+            return current_level, 0.0, 0, "Max Level"
+
+        next_level = self.levels[reached]
+        if reached > 0:
+            prev_level_points = self.thresholds[reached - 1]
+            level_points_needed = next_level["points_required"] - prev_level_points
+            current_level_progress = ((total_points - prev_level_points) / level_points_needed) * 100
+            current_level = self.levels[reached - 1]["level"]
+        else:
+            current_level_progress = (total_points / next_level["points_required"]) * 100
+            current_level = 1
+
+        return current_level, current_level_progress, next_level["points_required"] - total_points, next_level["title"]
+
+
+catalog = GamificationCatalog()
+
+
+async def get_catalog(db: Database) -> GamificationCatalog:
+    """Return the catalog, reloading it first if it is stale."""
+    await catalog.ensure_fresh(db)
+    return catalog
+
+
+async def bump_catalog_version(db: Database):
+    """Signal every worker that levels or achievements have changed."""
+    await db.get_collection(CATALOG_META_COLLECTION).update_one(
+        {"_id": CATALOG_VERSION_ID},
+        {"$inc": {"version": 1}},
+        upsert=True
+    )
+    catalog.invalidate()
@@ -0,0 +1,238 @@
+import asyncio
+import os
+import uuid
+from datetime import datetime, timedelta, timezone
+from typing import Any, Awaitable, Callable, List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.database import Database
+
+from models.gamification import PointsEntry, PointsReason, UserStatsUpdate
+from services.ledger import append_entries
+
+
+GAMIFICATION_WORKERS = int(os.getenv("GAMIFICATION_WORKERS", "2"))
+GAMIFICATION_EVENT_LEASE_SECONDS = int(os.getenv("GAMIFICATION_EVENT_LEASE_SECONDS", "30"))
+GAMIFICATION_EVENT_MAX_ATTEMPTS = int(os.getenv("GAMIFICATION_EVENT_MAX_ATTEMPTS", "10"))
+GAMIFICATION_POLL_SECONDS = float(os.getenv("GAMIFICATION_POLL_SECONDS", "1.0"))
+
+# Processed events are removed by a TTL index after this time
+EVENTS_RETENTION_SECONDS = 7 * 24 * 3600
+
+EVENTS_COLLECTION = "gamification_events"
+
+# Event types
+ITEMS_CHANGED = "todo_items_changed"
+USER_ACTIVITY = "user_activity"
+
+_supports_transactions = None
+_wakeup = None
+_workers: List[asyncio.Task] = []
+
+
+def _get_wakeup() -> asyncio.Event:
+    global _wakeup
+    if _wakeup is None:
+        _wakeup = asyncio.Event()
+    return _wakeup
+
+
+async def supports_transactions(db: Database) -> bool:
+    """Multi-document transactions need a replica set or a sharded cluster."""
+    global _supports_transactions
+    if _supports_transactions is None:
+        hello = await db.client.admin.command("hello")
+        _supports_transactions = "setName" in hello or hello.get("msg") == "isdbgrid"
+    return _supports_transactions
+
+
+async def run_with_outbox(db: Database, callback: Callable[[Optional[Any]], Awaitable[Any]]) -> Any:
+    """
+    Runs callback(session) - a write plus its record_event calls - so that
+    both commit together. With transaction support it runs through
+    with_transaction, which retries the whole callback on
+    TransientTransactionError (e.g. a WriteConflict between concurrent
+    PATCHes of the same skill) and the commit on
+    UnknownTransactionCommitResult; the callback must therefore be safe to
+    run more than once. On a standalone server it is called once with
+    session None and the event is recorded directly after the write.
+    """
+    if not await supports_transactions(db):
+        return await callback(None)
+
+    async with await db.client.start_session() as session:
+        return await session.with_transaction(callback)
+
+
+async def record_event(db: Database, event_type: str, user_id: str, payload: dict, session=None) -> str:
+    """Append a gamification event to the outbox."""
+    now = datetime.now(timezone.utc)
+    event_id = uuid.uuid4().hex
+    await db.get_collection(EVENTS_COLLECTION).insert_one(
+        {
+            "_id": event_id,
+            "type": event_type,
+            "user_id": user_id,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "available_at": now,
+            "created_at": now,
+        },
+        session=session
+    )
+    # Wake up the in-process workers - other workers pick it up on their next poll
+    _get_wakeup().set()
+    return event_id
+
+
+# Oldest due event first (db_indexes explains this shape)
+DUE_EVENTS_SORT = [("available_at", 1)]
+
+
+def due_events_filter(now) -> dict:
+    """Pending events that are due and processing events whose lease has expired."""
+    return {
+        "$or": [
+            {"status": "pending", "available_at": {"$lte": now}},
+            {"status": "processing", "locked_until": {"$lt": now}},
+        ]
+    }
+
+
+async def claim_next_event(db: Database) -> Optional[dict]:
+    """Lease the oldest due event, including events whose lease has expired."""
+    now = datetime.now(timezone.utc)
+    return await db.get_collection(EVENTS_COLLECTION).find_one_and_update(
+        due_events_filter(now),
+        {
+            "$set": {
+                "status": "processing",
+                "locked_until": now + timedelta(seconds=GAMIFICATION_EVENT_LEASE_SECONDS),
+            },
+            "$inc": {"attempts": 1},
+        },
+        sort=DUE_EVENTS_SORT,
+        return_document=ReturnDocument.AFTER
+    )
+
+
+async def _apply_stats(db: Database, event: dict, update: UserStatsUpdate, points_changed: bool = False):
+    # Import here to avoid circular imports
+    from routers.gamification import (
+        apply_user_stats_update, check_and_unlock_achievements, get_or_create_user_stats,
+        touched_condition_types
+    )
+
+    user_id = event["user_id"]
+    user_stats = await apply_user_stats_update(db, user_id, update, event_id=event["_id"])
+    if user_stats is None:
+        # Stats were already updated by an earlier attempt of this event
+        user_stats = await get_or_create_user_stats(db, user_id)
+
+    # Achievement unlocks are idempotent through the unique (user_id, achievement_id) index
+    await check_and_unlock_achievements(db, user_id, user_stats, touched_condition_types(update, points_changed))
+
+
+async def _process_items_changed(db: Database, event: dict):
+    payload = event["payload"]
+    todo_id = payload["todo_id"]
+
+    entries = [
+        PointsEntry(
+            user_id=event["user_id"],
+            points=10,
+            reason=PointsReason.TODO_COMPLETED,
+            reference_id=todo_id,
+            metadata={"item_id": item_id}
+        )
+        for item_id in payload["completed_item_ids"]
+    ]
+    if payload["skill_completed"]:
+        entries.append(PointsEntry(
+            user_id=event["user_id"],
+            points=payload["skill_bonus"],
+            reason=PointsReason.SKILL_COMPLETED,
+            reference_id=todo_id
+        ))
+
+    # Idempotency keys make the append safe when the event is redelivered
+    idempotency_keys = [f"{event['_id']}:{index}" for index in range(len(entries))]
+    await append_entries(db, event["user_id"], entries, idempotency_keys)
+
+    # One stats update covering completions and the streak
+    update = UserStatsUpdate(
+        todos_completed=len(payload["completed_item_ids"]),
+        skills_completed=1 if payload["skill_completed"] else 0,
+        update_streak=True
+    )
+    await _apply_stats(db, event, update, points_changed=bool(entries))
+
+
+async def _process_user_activity(db: Database, event: dict):
+    await _apply_stats(db, event, UserStatsUpdate(update_streak=True))
+
+
+EVENT_HANDLERS = {
+    ITEMS_CHANGED: _process_items_changed,
+    USER_ACTIVITY: _process_user_activity,
+}
+
+
+async def process_event(db: Database, event: dict):
+    """Run the handler for an event and record the outcome."""
+    events = db.get_collection(EVENTS_COLLECTION)
+    try:
+        await EVENT_HANDLERS[event["type"]](db, event)
+    except Exception as e:
+        print(f"Error processing gamification event {event['_id']}: {e}")
+        failed = event["attempts"] >= GAMIFICATION_EVENT_MAX_ATTEMPTS
+        # Exponential backoff, capped at five minutes
+        delay = min(2 ** event["attempts"], 300)
+        await events.update_one(
+            {"_id": event["_id"]},
+            {"$set": {
+                "status": "failed" if failed else "pending",
+                "available_at": datetime.now(timezone.utc) + timedelta(seconds=delay),
+                "error": str(e),
+            }}
+        )
+        return
+
+    await events.update_one(
+        {"_id": event["_id"]},
+        {"$set": {"status": "done", "processed_at": datetime.now(timezone.utc)}, "$unset": {"locked_until": ""}}
+    )
+
+
+async def run_worker(db: Database):
+    """Consume events until cancelled."""
+    wakeup = _get_wakeup()
+    while True:
+        try:
+            event = await claim_next_event(db)
+        except Exception as e:
+            print(f"Error claiming gamification event: {e}")
+            event = None
+
+        if event is not None:
+            await process_event(db, event)
+            continue
+
+        wakeup.clear()
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout=GAMIFICATION_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+
+def start_workers(db: Database):
+    for _ in range(GAMIFICATION_WORKERS):
+        _workers.append(asyncio.create_task(run_worker(db)))
+
+
+async def stop_workers():
+    for task in _workers:
+        task.cancel()
+    await asyncio.gather(*_workers, return_exceptions=True)
+    _workers.clear()
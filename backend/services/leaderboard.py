@@ -0,0 +1,142 @@
+import asyncio
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Dict, Optional, Tuple
+
+from pymongo import DESCENDING
+from pymongo.database import Database
+
+from models.gamification import Leaderboard, LeaderboardBoard, LeaderboardEntry, LeaderboardRank
+
+
+LEADERBOARD_REFRESH_SECONDS = float(os.getenv("LEADERBOARD_REFRESH_SECONDS", "60"))
+LEADERBOARD_TOP_N = int(os.getenv("LEADERBOARD_TOP_N", "100"))
+
+WEEKLY_COLLECTION = "leaderboard_weekly"
+WEEKLY_RETENTION_SECONDS = 14 * 24 * 3600
+
+# All-time boards rank user_stats directly on an indexed field
+ALL_TIME_FIELDS = {
+    LeaderboardBoard.POINTS: "total_points",
+    LeaderboardBoard.STREAK: "longest_streak",
+}
+
+_snapshots: Dict[Tuple[LeaderboardBoard, Optional[str]], Tuple[float, Leaderboard]] = {}
+_refresh_task: Optional[asyncio.Task] = None
+
+
+def current_week(now: Optional[datetime] = None) -> Tuple[str, datetime]:
+    """Return the ISO week label and its start (Monday 00:00 UTC)."""
+    now = (now or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    year, week, _ = now.isocalendar()
+    start = (now - timedelta(days=now.weekday())).replace(hour=0, minute=0, second=0, microsecond=0)
+    return f"{year}-W{week:02d}", start
+
+
+async def refresh_weekly(db: Database, now: Optional[datetime] = None) -> str:
+    """
+    Materialize this week's per-user totals from points_history into
+    leaderboard_weekly. Only the current week's entries are scanned.
+    """
+    week, week_start = current_week(now)
+    await db.get_collection("points_history").aggregate([
+        # appended_at is UTC, unlike the naive local created_at
+        {"$match": {"appended_at": {"$gte": week_start}}},
+        {"$group": {"_id": "$user_id", "points": {"$sum": "$points"}}},
+        {"$project": {
+            "_id": {"$concat": [week, ":", "$_id"]},
+            "week": week,
+            "user_id": "$_id",
+            "points": 1,
+            # Rows of past weeks expire through a TTL index on updated_at
+            "updated_at": "$$NOW",
+        }},
+        {"$merge": {"into": WEEKLY_COLLECTION, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+    ]).to_list(None)
+    return week
+
+
+def _board_source(db: Database, board: LeaderboardBoard, week: Optional[str]):
+    """Collection, base filter and value field backing a board."""
+    if board == LeaderboardBoard.WEEKLY:
+        return db.get_collection(WEEKLY_COLLECTION), {"week": week}, "points"
+    return db.get_collection("user_stats"), {}, ALL_TIME_FIELDS[board]
+
+
+async def _compute_top(db: Database, board: LeaderboardBoard, week: Optional[str], limit: int) -> Leaderboard:
+    collection, query, field = _board_source(db, board, week)
+    documents = await collection.find(query, {"user_id": 1, field: 1}).sort(field, DESCENDING).limit(limit).to_list(limit)
+
+    entries = []
+    for position, document in enumerate(documents):
+        value = document.get(field) or 0
+        # Competition ranking: equal values share the rank of the first of them
+        rank = entries[-1].rank if entries and entries[-1].value == value else position + 1
+        entries.append(LeaderboardEntry(rank=rank, user_id=document["user_id"], value=value))
+
+    return Leaderboard(
+        board=board,
+        period=week,
+        generated_at=datetime.now(timezone.utc).isoformat(),
+        entries=entries
+    )
+
+
+async def get_top(db: Database, board: LeaderboardBoard, limit: int = LEADERBOARD_TOP_N) -> Leaderboard:
+    """Serve the top-N from the cached snapshot, recomputing it when it is older than the refresh cadence."""
+    week = current_week()[0] if board == LeaderboardBoard.WEEKLY else None
+    key = (board, week)
+
+    cached = _snapshots.get(key)
+    if cached is None or time.monotonic() - cached[0] > LEADERBOARD_REFRESH_SECONDS:
+        snapshot = await _compute_top(db, board, week, LEADERBOARD_TOP_N)
+        _snapshots[key] = (time.monotonic(), snapshot)
+    else:
+        snapshot = cached[1]
+
+    return snapshot.model_copy(update={"entries": snapshot.entries[:limit]})
+
+
+async def get_rank(db: Database, board: LeaderboardBoard, user_id: str) -> LeaderboardRank:
+    """
+    A user's rank is one plus the number of users with a strictly higher
+    value - a COUNT_SCAN over the descending index, no collection scan.
+    """
+    week = current_week()[0] if board == LeaderboardBoard.WEEKLY else None
+    collection, query, field = _board_source(db, board, week)
+
+    document = await collection.find_one({**query, "user_id": user_id}, {field: 1})
+    if document is None:
+        return LeaderboardRank(board=board, period=week, user_id=user_id, value=0, rank=None)
+
+    value = document.get(field) or 0
+    ahead = await collection.count_documents({**query, field: {"$gt": value}})
+    return LeaderboardRank(board=board, period=week, user_id=user_id, value=value, rank=ahead + 1)
+
+
+async def run_refresher(db: Database):
+    """Periodically rebuild the weekly table and the cached top-N snapshots."""
+    while True:
+        try:
+            week = await refresh_weekly(db)
+            for board in LeaderboardBoard:
+                period = week if board == LeaderboardBoard.WEEKLY else None
+                snapshot = await _compute_top(db, board, period, LEADERBOARD_TOP_N)
+                _snapshots[(board, period)] = (time.monotonic(), snapshot)
+        except Exception as e:
+            print(f"Error refreshing leaderboards: {e}")
+        await asyncio.sleep(LEADERBOARD_REFRESH_SECONDS)
+
+
+def start_refresher(db: Database):
+    global _refresh_task
+    _refresh_task = asyncio.create_task(run_refresher(db))
+
+
+async def stop_refresher():
+    global _refresh_task
+    if _refresh_task is not None:
+        _refresh_task.cancel()
+        await asyncio.gather(_refresh_task, return_exceptions=True)
+        _refresh_task = None
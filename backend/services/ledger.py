@@ -0,0 +1,245 @@
+import argparse
+import asyncio
+import os
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+
+from pymongo import ReturnDocument
+from pymongo.database import Database
+from pymongo.errors import BulkWriteError
+
+from models.gamification import PointsEntry
+
+
+# points_history is the authoritative ledger. Every entry gets a per-user
+# sequence number; user_stats.total_points is a snapshot of all entries up to
+# user_stats.ledger_watermark and is advanced by folding the entries after it.
+# appended_at is the UTC time the ledger wrote an entry - created_at belongs to
+# the entry and is naive local time.
+
+LEDGER_COLLECTION = "points_history"
+STATS_COLLECTION = "user_stats"
+
+# A sequence gap older than this is treated as a failed append and skipped
+LEDGER_GAP_GRACE_SECONDS = int(os.getenv("LEDGER_GAP_GRACE_SECONDS", "30"))
+LEDGER_SYNC_RETRIES = 5
+
+
+def _watermark_filter(user_id: str, watermark: int) -> dict:
+    if watermark == 0:
+        return {"user_id": user_id, "ledger_watermark": {"$in": [0, None]}}
+    return {"user_id": user_id, "ledger_watermark": watermark}
+
+
+def _appended_at(entry: dict) -> datetime:
+    """pymongo returns naive UTC datetimes; entries without appended_at are old"""
+    value = entry.get("appended_at")
+    if not isinstance(value, datetime):
+        return datetime.min.replace(tzinfo=timezone.utc)
+    return value if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+async def sync_user(db: Database, user_id: str) -> int:
+    """
+    Fold all ledger entries after the user's watermark into total_points.
+
+    Costs O(new entries). Returns the number of entries folded.
+    """
+    stats_collection = db.get_collection(STATS_COLLECTION)
+    ledger = db.get_collection(LEDGER_COLLECTION)
+
+    for _ in range(LEDGER_SYNC_RETRIES):
+        snapshot = await stats_collection.find_one({"user_id": user_id}, {"ledger_watermark": 1})
+        watermark = (snapshot or {}).get("ledger_watermark") or 0
+
+        entries = await ledger.find(
+            {"user_id": user_id, "seq": {"$gt": watermark}},
+            {"seq": 1, "points": 1, "appended_at": 1}
+        ).sort("seq", 1).to_list(None)
+
+        # Fold the contiguous run of sequence numbers. A gap either belongs
+        # to an append that is still in flight (stop - its writer will sync)
+        # or to one that failed long ago (skip it).
+        stale_before = datetime.now(timezone.utc) - timedelta(seconds=LEDGER_GAP_GRACE_SECONDS)
+        new_watermark = watermark
+        delta = 0
+        for entry in entries:
+            if entry["seq"] != new_watermark + 1 and _appended_at(entry) > stale_before:
+                break
+            new_watermark = entry["seq"]
+            delta += entry["points"]
+
+        if new_watermark == watermark:
+            return 0
+
+        result = await stats_collection.update_one(
+            _watermark_filter(user_id, watermark),
+            {"$inc": {"total_points": delta}, "$set": {"ledger_watermark": new_watermark}}
+        )
+        if result.modified_count:
+            return len([entry for entry in entries if entry["seq"] <= new_watermark])
+        # Another writer advanced the watermark concurrently - read it again
+
+    return 0
+
+
+async def append_entries(
+    db: Database, user_id: str, entries: List[PointsEntry], idempotency_keys: Optional[List[str]] = None
+):
+    """
+    Append entries to the ledger and fold them into the user's snapshot.
+
+    With idempotency_keys, entries that were already written (same key) are
+    skipped, which makes appends safe to retry.
+    """
+    if idempotency_keys:
+        # Drop entries a previous attempt already wrote, so no sequence numbers are wasted on them
+        existing = await db.get_collection(LEDGER_COLLECTION).distinct(
+            "idempotency_key", {"idempotency_key": {"$in": idempotency_keys}}
+        )
+        pending = [(entry, key) for entry, key in zip(entries, idempotency_keys) if key not in existing]
+        entries = [entry for entry, _ in pending]
+        idempotency_keys = [key for _, key in pending]
+
+    if not entries:
+        return
+
+    stats_collection = db.get_collection(STATS_COLLECTION)
+
+    # Reserve a block of sequence numbers for this append
+    reserved = await stats_collection.find_one_and_update(
+        {"user_id": user_id},
+        {"$inc": {"ledger_seq": len(entries)}},
+        projection={"ledger_seq": 1},
+        upsert=True,
+        return_document=ReturnDocument.AFTER
+    )
+    first_seq = reserved["ledger_seq"] - len(entries) + 1
+    appended_at = datetime.now(timezone.utc)
+
+    documents = []
+    for offset, entry in enumerate(entries):
+        document = entry.dict(exclude={"id"})
+        document["seq"] = first_seq + offset
+        document["appended_at"] = appended_at
+        if idempotency_keys:
+            document["idempotency_key"] = idempotency_keys[offset]
+        documents.append(document)
+
+    inserted = list(documents)
+    try:
+        await db.get_collection(LEDGER_COLLECTION).insert_many(documents, ordered=False)
+    except BulkWriteError as e:
+        # Entries written by an earlier attempt are fine, anything else is not
+        errors = e.details.get("writeErrors", [])
+        if any(error["code"] != 11000 for error in errors):
+            raise
+        failed = {error["index"] for error in errors}
+        inserted = [document for index, document in enumerate(documents) if index not in failed]
+
+    # Fast path: nobody else is between the watermark and our block
+    if len(inserted) == len(documents):
+        result = await stats_collection.update_one(
+            _watermark_filter(user_id, first_seq - 1),
+            {
+                "$inc": {"total_points": sum(document["points"] for document in documents)},
+                "$set": {"ledger_watermark": documents[-1]["seq"]}
+            }
+        )
+        if result.modified_count:
+            return
+
+    await sync_user(db, user_id)
+
+
+async def rebuild_user(db: Database, user_id: str):
+    """
+    Recompute the snapshot from the full ledger - O(history), for repairs
+    of snapshots that were mutated outside the ledger.
+    """
+    totals = await db.get_collection(LEDGER_COLLECTION).aggregate([
+        {"$match": {"user_id": user_id}},
+        {"$group": {"_id": None, "total": {"$sum": "$points"}, "watermark": {"$max": "$seq"}}}
+    ]).to_list(1)
+    total = totals[0]["total"] if totals else 0
+    watermark = (totals[0]["watermark"] if totals else None) or 0
+
+    await db.get_collection(STATS_COLLECTION).update_one(
+        {"user_id": user_id},
+        {
+            "$set": {"total_points": total, "ledger_watermark": watermark},
+            "$max": {"ledger_seq": watermark}
+        },
+        upsert=True
+    )
+
+
+async def backfill_appended_at(db: Database) -> dict:
+    """
+    Give entries written before appended_at existed one, read from their
+    created_at in this server's local time (as datetime.now() wrote it).
+    """
+    utc_offset = datetime.now().astimezone().strftime("%z")
+    result = await db.get_collection(LEDGER_COLLECTION).update_many(
+        {"appended_at": {"$exists": False}},
+        [{"$set": {"appended_at": {"$dateFromString": {
+            "dateString": "$created_at", "timezone": utc_offset, "onError": None, "onNull": None
+        }}}}]
+    )
+    return {"backfilled": result.modified_count}
+
+
+async def _ledger_user_ids(db: Database):
+    cursor = db.get_collection(LEDGER_COLLECTION).aggregate(
+        [{"$group": {"_id": "$user_id"}}], allowDiskUse=True
+    )
+    async for group in cursor:
+        yield group["_id"]
+
+
+async def run_for_all_users(db: Database, action, concurrency: int) -> int:
+    """Run action(db, user_id) for every user in the ledger, `concurrency` at a time."""
+    semaphore = asyncio.Semaphore(concurrency)
+    tasks = []
+    processed = 0
+
+    async def run(user_id):
+        async with semaphore:
+            await action(db, user_id)
+
+    async for user_id in _ledger_user_ids(db):
+        tasks.append(asyncio.create_task(run(user_id)))
+        processed += 1
+        # Keep the number of pending tasks bounded for very large user bases
+        if len(tasks) >= concurrency * 100:
+            await asyncio.gather(*tasks)
+            tasks.clear()
+
+    await asyncio.gather(*tasks)
+    return processed
+
+
+async def _main():
+    parser = argparse.ArgumentParser(description="Maintain user_stats snapshots of the points ledger")
+    parser.add_argument("command", choices=["sync", "rebuild"],
+                        help="sync folds new entries (O(new)), rebuild recomputes from the full ledger")
+    parser.add_argument("--user", help="Only process this user")
+    parser.add_argument("--concurrency", type=int, default=16, help="Users processed in parallel")
+    args = parser.parse_args()
+
+    from database import client
+    db = client.get_database()
+    action = sync_user if args.command == "sync" else rebuild_user
+
+    started = datetime.now(timezone.utc)
+    if args.user:
+        await action(db, args.user)
+        users = 1
+    else:
+        users = await run_for_all_users(db, action, args.concurrency)
+    elapsed = (datetime.now(timezone.utc) - started).total_seconds()
+    print(f"{args.command} finished for {users} users in {elapsed:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(_main())
@@ -0,0 +1,6 @@
+import os
+import sys
+
+# Tests import the backend modules the way app.py does, and never reach a real model
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("LLM_BACKEND", "fake")
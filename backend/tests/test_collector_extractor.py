@@ -0,0 +1,58 @@
+import pytest
+
+from ai.collector import COLLECTOR_EXTRACTOR_MIN_CONFIDENCE, _prefill, extract_skill_data
+
+
+@pytest.mark.parametrize("message, field, value", [
+    ("Ich möchte Gitarre lernen", "skill", "Gitarre"),
+    ("I want to learn Rust within 6 months", "skill", "Rust"),
+    ("Ich bin Anfänger", "experience", "Anfänger"),
+    ("I have 5 years of experience", "experience", "5 years of experience"),
+    ("Ich programmiere seit 2019", "experience", "seit 2019"),
+    ("Mein Ziel ist es, eine eigene App zu bauen.", "goal", "eine eigene App zu bauen"),
+    ("in 3 Monaten", "deadline", "in 3 Monaten"),
+    ("innerhalb von zwei Wochen", "deadline", "innerhalb von zwei Wochen"),
+    ("within 6 months", "deadline", "within 6 months"),
+    ("bis Ende 2026", "deadline", "bis Ende 2026"),
+    ("bis 31.12.2026", "deadline", "bis 31.12.2026"),
+    ("3 Monate Zeit, bis Ende 2026", "deadline", "bis Ende 2026"),
+])
+def test_confident_fields(message, field, value):
+    result = extract_skill_data(message)[field]
+    assert result["value"] == value
+    assert result["confidence"] >= COLLECTOR_EXTRACTOR_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("message", [
+    "Ich spiele seit 2 Jahren Gitarre",
+    "I have been playing guitar for 5 years",
+    "since 3 months I am learning",
+    "Ich habe vor 2 Jahren angefangen",
+    "I started 2 years ago",
+    "3 Jahre Erfahrung",
+    "5 years of experience",
+])
+def test_past_durations_are_no_deadline(message):
+    assert "deadline" not in extract_skill_data(message)
+
+
+@pytest.mark.parametrize("message", ["3 Monate", "two weeks"])
+def test_bare_durations_are_only_hints(message):
+    assert extract_skill_data(message)["deadline"]["confidence"] < COLLECTOR_EXTRACTOR_MIN_CONFIDENCE
+
+
+@pytest.mark.parametrize("message, complete", [
+    ("Ich spiele seit 2 Jahren Gitarre und bin fortgeschritten. "
+     "Mein Ziel ist es, Jazz Standards spielen zu können.", False),
+    ("I have been playing guitar for 5 years, intermediate. My goal is to play jazz standards.", False),
+    ("Ich möchte Gitarre lernen, bin Anfänger. Mein Ziel ist es, Lagerfeuerlieder spielen zu können. "
+     "Das will ich in 3 Monaten schaffen.", True),
+    ("I want to learn guitar in 3 months, beginner. My goal is to play jazz standards.", True),
+    ("Ich möchte Gitarre lernen, bin Anfänger. Mein Ziel ist es, Lagerfeuerlieder spielen zu können. "
+     "Ich habe 3 Monate Zeit.", False),
+])
+def test_prefill_skips_llm_only_when_all_fields_are_certain(message, complete):
+    prefilled, response = _prefill({"message": message})
+    assert (response is not None) == complete
+    if not complete:
+        assert not prefilled.get("deadline")